@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, NamedTuple
+
+# Fetching the inputs concurrently. Supply scraping and the NVCR download
+# are both network and browser bound and independent, so each runs in its
+# own thread, and each source normalizes its data as soon as it has it
+# while the other is still in flight. Threads can't be killed, so a source
+# that times out is abandoned (its thread is a daemon) rather than stopped.
+
+
+class Source(NamedTuple):
+    """One input: fetch() returns its normalized data within timeout seconds."""
+    name: str
+    fetch: Callable[[], Any]
+    timeout: float | None = None
+
+
+class AcquisitionError(Exception):
+    """One or more sources failed or timed out; errors maps name to error."""
+
+    def __init__(self, errors: dict[str, BaseException]) -> None:
+        self.errors = errors
+        super().__init__('; '.join(f'{name}: {error}'
+                                   for name, error in errors.items()))
+
+
+def _start(source: Source) -> Future:
+    """Run source.fetch() in a daemon thread."""
+    future: Future = Future()
+
+    def run() -> None:
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(source.fetch())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f'acquire-{source.name}',
+                     daemon=True).start()
+    return future
+
+
+def acquire(sources: list[Source]) -> dict[str, Any]:
+    """Fetch every source concurrently and return their data by name.
+
+    A failed source doesn't stop the others: they run on, so work like a
+    finished supply scrape is kept (and cached) for the next run. All the
+    failures are raised together as an AcquisitionError.
+    """
+    started = time.monotonic()
+    pending = {_start(source): source for source in sources}
+    results: dict[str, Any] = {}
+    errors: dict[str, BaseException] = {}
+    while pending:
+        deadlines = {future: started + source.timeout
+                     for future, source in pending.items()
+                     if source.timeout is not None}
+        timeout = None
+        if deadlines:
+            timeout = max(0.0, min(deadlines.values()) - time.monotonic())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            source = pending.pop(future)
+            try:
+                results[source.name] = future.result()
+                print(f'{source.name.capitalize()} data ready after '
+                      f'{time.monotonic() - started:.1f} s')
+            except Exception as e:
+                errors[source.name] = e
+
+        now = time.monotonic()
+        for future, deadline in deadlines.items():
+            if future in pending and now >= deadline:
+                source = pending.pop(future)
+                errors[source.name] = TimeoutError(
+                    f'not ready within {source.timeout:g} seconds')
+
+    if errors:
+        raise AcquisitionError(errors)
+    return results
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import csv
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+from cma_names import ALIAS_FILE, canonicalize_cmas
+from metrics import (cma_aggregates, cma_metrics, create_shu_summary,
+                     hu_overview)
+from profiling import stage
+from report import write_report
+from table_export import FORMATS, report_tables, write_tables
+from trade_data import merge_duplicate_ghu_trades, merge_duplicate_shu_trades
+from trade_store import load_trades, update_store
+
+# The analysis pipeline behind trade_analysis.py, split so that trade and
+# supply data are loaded and normalized once and any number of report
+# windows are rendered from the same in-memory frames.
+
+GHU_REPORT_COLUMNS: list[str] = ['date', 'cma', 'sbv', 'ghu', 'lt',
+                                 'ghu_price', 'price_in_gst', 'price_ex_gst']
+SHU_REPORT_COLUMNS: list[str] = ['date', 'lt', 'sbu', 'shu_price', 'species',
+                                 'price_in_gst', 'price_ex_gst']
+
+
+class ReportJob(NamedTuple):
+    """One report: the trades from start to end written to output.
+
+    output_format is xlsx for the Excel report, or a table format (see
+    table_export.py) to write the report's tables to a directory.
+    """
+    start: datetime
+    end: datetime
+    output: str
+    output_format: str = 'xlsx'
+
+
+def period_start(end: datetime, months: int) -> datetime:
+    """Return the first day of the month that begins an n-month window ending in end's month."""
+    total = end.year * 12 + (end.month - 1) - (months - 1)
+    return end.replace(year=total // 12, month=total % 12 + 1, day=1)
+
+
+def default_window(today: datetime | None = None) -> tuple[datetime, datetime]:
+    """The 12 months ending at the end of the previous month."""
+    current_date = today or datetime.today()
+    end_date = current_date.replace(day=1) - timedelta(days=1)
+    return period_start(end_date, 12), end_date
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def read_jobs(path: str, output_format: str = 'xlsx') -> list[ReportJob]:
+    """Read report jobs from a CSV file with start, end and output columns.
+
+    An optional format column overrides output_format for its row. An
+    unknown format raises ValueError naming the line, before any report
+    is rendered.
+    """
+    jobs = []
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            row_format = row.get('format') or output_format
+            if row_format not in FORMATS:
+                raise ValueError(
+                    f'{path}, line {reader.line_num}: invalid format '
+                    f'{row_format!r} (choose from '
+                    f"{', '.join(map(repr, FORMATS))})")
+            jobs.append(ReportJob(parse_date(row['start']),
+                                  parse_date(row['end']), row['output'],
+                                  row_format))
+    return jobs
+
+
+def merge_trades(hu_df: pd.DataFrame, store: Path | None = None
+                 ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Merge duplicate GHU and SHU trades, returning (ghu_df, shu_df).
+
+    Duplicate SHU trades share a date, shu_price and species and duplicate
+    GHU trades a date, cma and ghu_price. With a store directory (see
+    trade_store.store_dir) only the months that changed since the last run
+    on the same input are merged again.
+    """
+    print('Merging duplicate SHU and GHU trades...')
+    if store is None:
+        shu_rows = hu_df[pd.notnull(hu_df['species'])]
+        with stage('shu_merge', len(shu_rows)) as s:
+            shu_df = merge_duplicate_shu_trades(shu_rows)
+            s.rows_out = len(shu_df)
+        ghu_rows = hu_df[pd.isnull(hu_df['species'])]
+        with stage('ghu_merge', len(ghu_rows)) as s:
+            ghu_df = merge_duplicate_ghu_trades(ghu_rows)
+            s.rows_out = len(ghu_df)
+    else:
+        with stage('store_update', len(hu_df)):
+            changed_months = update_store(hu_df, store)
+        print(f'Months merged this run: {len(changed_months)}')
+        with stage('store_load') as s:
+            ghu_df, shu_df = load_trades(store)
+            s.rows_out = len(ghu_df) + len(shu_df)
+    print(f'SHU trades after merge: {len(shu_df)} rows')
+    return ghu_df, shu_df
+
+
+def prepare_trades(ghu_df: pd.DataFrame, shu_df: pd.DataFrame,
+                   alias_file: Path = ALIAS_FILE
+                   ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Clean the merged history once so every report window can share it.
+
+    LTs become integers and CMA names are canonicalized across the whole
+    GHU history. The SHU records are kept newest first with only the
+    columns the report needs (sbv was used for merge, now removed).
+    """
+    ghu_df = ghu_df[GHU_REPORT_COLUMNS].copy()
+    # Replace all NaN values with 0 and make sure all LTs are integers
+    ghu_df['lt'] = ghu_df['lt'].fillna(0).astype('int32')
+
+    # Clean up all the inconsistancies in CMA names
+    with stage('cma_fuzz', len(ghu_df)) as s:
+        ghu_df['cma'], new_spellings = canonicalize_cmas(ghu_df['cma'],
+                                                         alias_file)
+        s.rows_out = len(ghu_df)
+    if new_spellings:
+        print(f'New CMA spellings matched this run: {new_spellings}')
+
+    shu_df = shu_df.sort_values(by='date', ascending=False).reset_index(drop=True)
+    return ghu_df, shu_df[SHU_REPORT_COLUMNS]
+
+
+def shu_summary_table(shu_df: pd.DataFrame, end_date: datetime,
+                      months: int) -> pd.DataFrame:
+    """SHU summary of the n months ending in end_date's month."""
+    start = pd.Timestamp(period_start(end_date, months).date())
+    window = shu_df[(shu_df['date'] >= start) &
+                    (shu_df['date'] <= pd.Timestamp(end_date.date()))]
+    summary = create_shu_summary(window)
+    return pd.DataFrame(list(summary.items()), columns=['Description', 'Value'])
+
+
+def render_report(job: ReportJob, ghu_df: pd.DataFrame, shu_df: pd.DataFrame,
+                  supply: dict[str, pd.DataFrame]) -> None:
+    """Render one report window from prepared trade and supply frames."""
+    shu_summary_df_1y = shu_summary_table(shu_df, job.end, 12)
+    shu_summary_df_3y = shu_summary_table(shu_df, job.end, 36)
+
+    # Drop all GHU trades outside of the date range
+    hu_df = ghu_df[(ghu_df['date'] >= pd.Timestamp(job.start.date())) &
+                   (ghu_df['date'] <= pd.Timestamp(job.end.date()))]
+    print(f'GHU trades after merge: {len(hu_df)} rows')
+
+    # Keep the GHU records in descending date order (newest first)
+    hu_df = hu_df.sort_values(by='date', ascending=False).reset_index(drop=True)
+
+    print('Calculating per CMA data-------------------------------------------\n')
+    with stage('metrics', len(hu_df)) as s:
+        aggregates = cma_aggregates(hu_df)
+        metrics_df = cma_metrics(aggregates, supply)
+
+        # Create high level summary data
+        hu_summary = hu_overview(aggregates, metrics_df)
+        s.rows_out = len(metrics_df)
+    print(hu_summary)
+
+    if job.output_format != 'xlsx':
+        with stage('table_write', len(hu_df) + len(shu_df)):
+            directory = write_tables(job.output, job.output_format,
+                                     report_tables(hu_df, shu_df,
+                                                   shu_summary_df_3y,
+                                                   shu_summary_df_1y,
+                                                   hu_summary, metrics_df))
+        print(f'Tables written to: {directory}')
+        return
+
+    print(f'Creating Excel Spreadsheet {job.output}...\n\n')
+    with stage('excel_write', len(hu_df) + len(shu_df)):
+        write_report(job.output, hu_df, shu_df, shu_summary_df_3y,
+                     shu_summary_df_1y, hu_summary, metrics_df)
+
+
+def run_jobs(jobs: list[ReportJob], ghu_df: pd.DataFrame,
+             shu_df: pd.DataFrame, supply: dict[str, pd.DataFrame],
+             workers: int = 1) -> None:
+    """Render every job from the same prepared frames.
+
+    With more than one worker and job, the reports are rendered in a
+    process pool (see render_pool.py) where workers can be forked, and
+    one after another elsewhere.
+    """
+    if workers > 1 and len(jobs) > 1:
+        from render_pool import can_fork, render_parallel
+        if can_fork():
+            # Worker stages aren't profiled; this times the whole pool
+            with stage('render_pool', len(jobs)):
+                render_parallel(jobs, ghu_df, shu_df, supply,
+                                min(workers, len(jobs)))
+            return
+        print('Rendering reports one at a time: worker processes are '
+              'forked, which is only done on Linux')
+
+    for job in jobs:
+        print(f'Report {job.output}: {job.start.date()} to {job.end.date()}')
+        render_report(job, ghu_df, shu_df, supply)
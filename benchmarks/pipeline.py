@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Time each stage of the analysis pipeline on synthetic workbooks.
+
+For every size, synthetic trade and supply workbooks are generated (see
+synthetic.py) or reused from the data directory, then each stage is run
+on a cold cache and timed:
+
+* parse:       read the 'Trade Prices by HU' sheet (see excel_reader.py)
+* coerce:      normalize columns and numeric types
+* shu_merge:   merge duplicate SHU trades
+* ghu_merge:   merge duplicate GHU trades
+* cma_fuzz:    clean LTs and canonicalize CMA names with an empty alias table
+* supply:      read the supply workbook
+* metrics:     per-CMA metrics and the HU Summary
+* excel_write: write the report workbook
+
+Every run is appended to a JSON lines results file and compared with the
+previous run of the same size, so regressions show up as ratios.
+
+    python benchmarks/pipeline.py [--sizes 1000 10000 ...] [--check]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from analysis import (ReportJob, prepare_trades,  # noqa: E402
+                      shu_summary_table)
+from cache import CACHE_DIR  # noqa: E402
+from excel_reader import excel_engine  # noqa: E402
+from metrics import cma_aggregates, cma_metrics, hu_overview  # noqa: E402
+from report import write_report  # noqa: E402
+from supply_cache import load_supply_file  # noqa: E402
+from synthetic import write_workbooks  # noqa: E402
+from trade_data import (merge_duplicate_ghu_trades,  # noqa: E402
+                        merge_duplicate_shu_trades, normalize_hu_frame,
+                        read_hu_sheet)
+
+DEFAULT_SIZES: list[int] = [1_000, 10_000, 100_000]
+DATA_DIR: Path = CACHE_DIR / 'benchmarks'
+RESULTS_FILE: Path = Path(__file__).resolve().parent / 'results' / 'pipeline.jsonl'
+
+# A stage this much slower than the previous run of the same size is
+# reported as a regression
+REGRESSION_RATIO = 1.25
+
+
+def _timed(stages: dict[str, dict[str, float]], name: str,
+           stage: Callable[[], Any]) -> Any:
+    """Run one stage quietly, recording its wall time and output rows."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = stage()
+        seconds = time.perf_counter() - start
+    frame = result[0] if isinstance(result, tuple) else result
+    stages[name] = {'seconds': round(seconds, 4),
+                    'rows': len(frame) if hasattr(frame, '__len__') else 0}
+    print(f'  {name:<12} {seconds:9.3f} s  {stages[name]["rows"]:>9} rows')
+    return result
+
+
+def run_pipeline(trade_file: Path, supply_file: Path) -> dict[str, dict[str, float]]:
+    """Time every stage on one pair of workbooks."""
+    stages: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        raw = _timed(stages, 'parse', lambda: read_hu_sheet(trade_file))
+        hu_df = _timed(stages, 'coerce', lambda: normalize_hu_frame(raw))
+        shu_df = _timed(stages, 'shu_merge', lambda: merge_duplicate_shu_trades(
+            hu_df[pd.notnull(hu_df['species'])]))
+        ghu_df = _timed(stages, 'ghu_merge', lambda: merge_duplicate_ghu_trades(
+            hu_df[pd.isnull(hu_df['species'])]))
+        ghu_df, shu_df = _timed(stages, 'cma_fuzz', lambda: prepare_trades(
+            ghu_df, shu_df, tmp / 'cma_aliases.json'))
+        supply = _timed(stages, 'supply',
+                        lambda: load_supply_file(supply_file, tmp / 'supply'))
+
+        # The whole generated history is one report window
+        dates = pd.to_datetime(ghu_df['date'])
+        job = ReportJob(dates.min().to_pydatetime(),
+                        dates.max().to_pydatetime(), str(tmp / 'report.xlsx'))
+        hu_df = ghu_df.sort_values(by='date', ascending=False).reset_index(drop=True)
+
+        def metrics() -> tuple[pd.DataFrame, pd.DataFrame]:
+            aggregates = cma_aggregates(hu_df)
+            metrics_df = cma_metrics(aggregates, supply)
+            return metrics_df, hu_overview(aggregates, metrics_df)
+        metrics_df, hu_summary = _timed(stages, 'metrics', metrics)
+
+        _timed(stages, 'excel_write', lambda: write_report(
+            job.output, hu_df, shu_df, shu_summary_table(shu_df, job.end, 36),
+            shu_summary_table(shu_df, job.end, 12), hu_summary, metrics_df))
+    return stages
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=REPO, check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(results_file: Path) -> list[dict[str, Any]]:
+    try:
+        with open(results_file) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def regressions(result: dict[str, Any], previous: dict[str, Any] | None,
+                ratio: float = REGRESSION_RATIO) -> list[str]:
+    """Compare a run with the previous run of the same size."""
+    if previous is None:
+        return []
+    slower = []
+    for name, stage in result['stages'].items():
+        before = previous['stages'].get(name, {}).get('seconds')
+        if not before:
+            continue
+        change = stage['seconds'] / before
+        print(f'  {name:<12} {change:6.2f}x vs {previous["commit"]}')
+        if change > ratio:
+            slower.append(f'{result["trades"]} trades: {name} '
+                          f'{before:.3f} s -> {stage["seconds"]:.3f} s')
+    return slower
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time each stage of the '
+                                     'trade analysis pipeline.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Trade counts to benchmark. Default is '
+                             f'{" ".join(map(str, DEFAULT_SIZES))}')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the synthetic data. Default is 0')
+    parser.add_argument('--data', type=Path, default=DATA_DIR,
+                        help=f'Directory for generated workbooks. Default is '
+                             f'{DATA_DIR}')
+    parser.add_argument('--results', type=Path, default=RESULTS_FILE,
+                        help='JSON lines file the results are appended to')
+    parser.add_argument('--no-save', action='store_true',
+                        help="Don't append this run to the results file")
+    parser.add_argument('--check', action='store_true',
+                        help='Exit non-zero if a stage regressed by more '
+                             f'than {REGRESSION_RATIO}x')
+    args = parser.parse_args()
+
+    history = load_results(args.results)
+    slower: list[str] = []
+    for size in args.sizes:
+        trade_file = args.data / f'trades-{size}-s{args.seed}.xlsx'
+        supply_file = args.data / f'supply-{size}-s{args.seed}.xlsx'
+        if not (trade_file.exists() and supply_file.exists()):
+            print(f'Generating {size} trades...')
+            trade_file, supply_file = write_workbooks(size, args.data,
+                                                      args.seed)
+
+        print(f'{size} trades:')
+        result = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'excel_engine': excel_engine(),
+            'trades': size,
+            'seed': args.seed,
+            'stages': run_pipeline(trade_file, supply_file),
+        }
+        previous = next((r for r in reversed(history)
+                         if r['trades'] == size and r['seed'] == args.seed),
+                        None)
+        slower += regressions(result, previous)
+
+        if not args.no_save:
+            args.results.parent.mkdir(parents=True, exist_ok=True)
+            with open(args.results, 'a') as f:
+                f.write(json.dumps(result) + '\n')
+
+    for line in slower:
+        print(f'REGRESSION: {line}')
+    sys.exit(1 if args.check and slower else 0)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Check trade_analysis.py startup against its budget.
+
+Startup is everything trade_analysis.py does before it touches data: the
+module-level imports and argument parsing. Cron jobs that re-analyse with
+--input and --supply pay this on every invocation, so it has a budget:
+
+* No scraping, download or workbook-editing dependency (selenium, bs4,
+  requests, thefuzz, openpyxl, xlsxwriter) may be imported at startup.
+  They are imported by the code paths that need them.
+* The median wall time of `trade_analysis.py --help` must stay within
+  STARTUP_BUDGET_S. Almost all of it is the pandas import.
+
+Exits non-zero if either check fails.
+
+    python benchmarks/startup.py [--runs N] [--budget SECONDS]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'trade_analysis.py'
+
+STARTUP_BUDGET_S = 1.2
+
+# Top-level packages that must not be loaded at startup
+DEFERRED_MODULES = ['selenium', 'bs4', 'requests', 'thefuzz', 'openpyxl',
+                    'xlsxwriter']
+
+# Runs the script up to argparse's --help exit, then reports what got
+# imported
+PROBE = f'''
+import runpy, sys
+sys.argv = [{str(SCRIPT)!r}, '--help']
+sys.path.insert(0, {str(SCRIPT.parent)!r})
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit:
+    pass
+print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})),
+      file=sys.stderr)
+'''
+
+
+def startup_time() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(SCRIPT), '--help'], check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def loaded_modules() -> set[str]:
+    result = subprocess.run([sys.executable, '-c', PROBE], check=True,
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    return set(result.stderr.split())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check trade_analysis.py '
+                                     'startup time and eager imports.')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of timed runs. Default is 5')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_S,
+                        help='Startup budget in seconds. Default is '
+                             f'{STARTUP_BUDGET_S}')
+    args = parser.parse_args()
+
+    ok = True
+
+    eager = sorted(set(DEFERRED_MODULES) & loaded_modules())
+    if eager:
+        print(f'FAIL: imported at startup: {", ".join(eager)}')
+        ok = False
+    else:
+        print('OK: no deferred modules imported at startup')
+
+    times = [startup_time() for _ in range(args.runs)]
+    median = statistics.median(times)
+    status = 'OK' if median <= args.budget else 'FAIL'
+    print(f'{status}: median startup {median * 1000:.0f} ms '
+          f'(budget {args.budget * 1000:.0f} ms, '
+          f'min {min(times) * 1000:.0f} ms over {args.runs} runs)')
+    ok = ok and median <= args.budget
+
+    sys.exit(0 if ok else 1)
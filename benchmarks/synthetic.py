@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Write synthetic NVCR trade and supply workbooks for benchmarking.
+
+The trade workbook has the 12-column 'Trade Prices by HU' layout the
+pipeline reads, with the things that make the real file slow to clean:
+inconsistent CMA spellings, SHU species strings with alternates in
+parentheses, duplicate trades to merge and the odd number stored as text.
+The supply workbook has one sheet per CMA, like ghu_search.py writes.
+
+    python benchmarks/synthetic.py --trades 100000 [--out DIR] [--seed N]
+
+Sizes are limited by Excel's 1,048,576-row sheet.
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cma_names import CMA_CHOICES, CMA_FOLDS  # noqa: E402
+from metrics import WA_SITES  # noqa: E402
+from trade_data import HU_SHEET  # noqa: E402
+
+# Data rows that fit on one sheet under the header
+MAX_TRADES = 1_048_575
+
+# Header row of the trade sheet. Only the positions matter to the pipeline.
+TRADE_HEADER: list[str] = [
+    'Date', 'CMA', 'SBV', 'GHU', 'Large Trees', 'SHU', 'GHU Price',
+    'SHU Price', 'Species', 'Price (incl GST)', 'Price (ex GST)', 'Notes'
+    ]
+
+SPECIES: list[str] = [
+    'Acacia leprosa', 'Allocasuarina luehmannii', 'Amphibromus fluitans',
+    'Bossiaea cordigera', 'Caladenia amoena', 'Dianella amoena',
+    'Diuris fragrantissima', 'Eucalyptus crenulata', 'Eucalyptus leucoxylon',
+    'Glycine latrobeana', 'Grevillea rosmarinifolia', 'Lachnagrostis adamsonii',
+    'Lepidium aschersonii', 'Litoria raniformis', 'Pimelea spinescens',
+    'Prasophyllum frenchii', 'Pterostylis cucullata', 'Rutidosis leptorrhynchoides',
+    'Senecio macrocarpus', 'Swainsona recta', 'Thesium australe',
+    'Xerochrysum palustre'
+    ]
+
+# Supply is scraped for the current CMAs only
+SUPPLY_CMAS: list[str] = [c for c in CMA_CHOICES if c not in CMA_FOLDS]
+
+
+def cma_spellings(cma: str) -> list[str]:
+    """Spellings of a CMA name like the ones found in the NVCR file."""
+    return [cma, cma, cma, f'{cma} CMA', cma.upper(), f'{cma} ',
+            cma.replace(' and ', ' & '), cma.lower()]
+
+
+def species_strings(rng: np.random.Generator, count: int) -> list[str]:
+    """Distinct SHU species strings: bare, comma lists and alternates."""
+    strings: set[str] = set()
+    count = min(count, 2000)
+    while len(strings) < count:
+        names = rng.choice(SPECIES, size=4, replace=False)
+        kind = rng.integers(3)
+        if kind == 0:
+            strings.add(str(names[0]))
+        elif kind == 1:
+            strings.add(', '.join(names[:rng.integers(2, 4)]))
+        else:
+            strings.add(f'{names[0]} ({rng.integers(1, 9) / 10} GHU; '
+                        f'{names[1]}, {names[2]} '
+                        f'{rng.integers(1, 30) / 10} SHU)')
+    return sorted(strings)
+
+
+def make_trades(trades: int, seed: int = 0, years: int = 5,
+                end: datetime | None = None) -> pd.DataFrame:
+    """Raw trade rows in the NVCR sheet layout, about a fifth of them SHU."""
+    if trades > MAX_TRADES:
+        raise ValueError(f'At most {MAX_TRADES} trades fit on one sheet')
+    rng = np.random.default_rng(seed)
+    # Up to the end of last month, like the default report window
+    end = end or datetime.today().replace(day=1) - timedelta(days=1)
+    dates = pd.date_range(end=end, periods=years * 365, freq='D').normalize()
+
+    spellings = [s for cma in CMA_CHOICES for s in cma_spellings(cma)]
+    species_pool = np.array(species_strings(rng, max(10, trades // 50)),
+                            dtype=object)
+
+    date = rng.choice(dates, trades)
+    cma = rng.choice(spellings, trades)
+    is_shu = rng.random(trades) < 0.2
+    units = rng.gamma(1.5, 1.0, trades).round(3)
+    price = rng.integers(80, 1200, trades) * 100.0
+    species = np.full(trades, None, dtype=object)
+    # Drawn for every row so the generated data doesn't change
+    species[is_shu] = rng.choice(species_pool, trades)[is_shu]
+
+    # Duplicate trades: same date, CMA, price and species as an earlier row
+    dup = rng.random(trades) < 0.15
+    dup[0] = False
+    source = rng.integers(0, np.arange(trades).clip(min=1))
+    for column in (date, cma, is_shu, price, species):
+        column[dup] = column[source[dup]]
+
+    lt = np.where(rng.random(trades) < 0.7, 0, rng.integers(1, 6, trades))
+    value = units * price
+    df = pd.DataFrame(dict(zip(TRADE_HEADER, [
+        date,
+        cma,
+        rng.random(trades).round(3),
+        np.where(is_shu, np.nan, units),
+        np.where(is_shu, np.nan, lt),
+        np.where(is_shu, units, np.nan),
+        np.where(is_shu, np.nan, price),
+        np.where(is_shu, price, np.nan),
+        species,
+        (value * 1.1).round(2),
+        value.round(2),
+        None,
+    ])))
+
+    # A few numbers stored as text, as in the real file
+    as_text = rng.random(trades) < 0.01
+    df['GHU'] = df['GHU'].astype(object)
+    df.loc[as_text & ~is_shu, 'GHU'] = df.loc[as_text & ~is_shu, 'GHU'].map(str)
+    return df.sort_values('Date', ascending=False, kind='stable')
+
+
+def make_supply(sites: int, seed: int = 0) -> dict[str, pd.DataFrame]:
+    """Per-CMA supply tables with the Water Authority sites mixed in."""
+    rng = np.random.default_rng(seed + 1)
+    supply = {}
+    for cma in SUPPLY_CMAS:
+        ids = [f'BBA-{i:04d}' for i in rng.choice(10_000, sites, replace=False)]
+        wa = WA_SITES.get(cma, [])
+        ids[:len(wa)] = wa[:sites]
+        supply[cma] = pd.DataFrame({
+            'Credit Site ID': ids,
+            'GHU': rng.gamma(1.2, 8.0, sites).round(3),
+            'LT': rng.integers(0, 20, sites),
+            'SBV': rng.random(sites).round(3),
+            'Bioregion': rng.choice(['Victorian Volcanic Plain', 'Gippsland Plain',
+                                     'Goldfields', 'Wimmera'], sites),
+        })
+    return supply
+
+
+def _writer(path: Path) -> pd.ExcelWriter:
+    # Not constant_memory: to_excel writes column by column
+    return pd.ExcelWriter(path, engine='xlsxwriter')
+
+
+def write_workbooks(trades: int, out_dir: Path, seed: int = 0,
+                    sites: int | None = None) -> tuple[Path, Path]:
+    """Write trades-<n>.xlsx and supply-<n>.xlsx and return their paths."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    trade_file = out_dir / f'trades-{trades}-s{seed}.xlsx'
+    supply_file = out_dir / f'supply-{trades}-s{seed}.xlsx'
+
+    with _writer(trade_file) as writer:
+        make_trades(trades, seed).to_excel(writer, sheet_name=HU_SHEET,
+                                           index=False)
+    with _writer(supply_file) as writer:
+        for cma, df in make_supply(sites or max(20, trades // 500),
+                                   seed).items():
+            df.to_excel(writer, sheet_name=cma, index=False)
+    return trade_file, supply_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic NVCR trade '
+                                     'and supply workbooks.')
+    parser.add_argument('--trades', type=int, default=10_000,
+                        help='Number of trade rows. Default is 10000')
+    parser.add_argument('--sites', type=int,
+                        help='Supply sites per CMA. Default scales with '
+                             '--trades')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed. Default is 0')
+    parser.add_argument('--out', default='.',
+                        help='Directory to write the workbooks to. Default '
+                             'is the current directory')
+    args = parser.parse_args()
+
+    for path in write_workbooks(args.trades, Path(args.out), args.seed,
+                                args.sites):
+        print(f'Wrote {path}')
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import atexit
+import logging
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from selenium.webdriver import Firefox
+
+# A pool of warm headless Firefox sessions shared by the scrapers. Firefox
+# takes seconds to start, so a browser is started once and handed from task
+# to task: supply scraping (ghu_search.py) and the Selenium trade download
+# (nvcr_download.py) check sessions out of the same pool. Selenium is only
+# imported when the first browser starts.
+#
+# A browser is checked before it is handed out and replaced if it doesn't
+# answer, replaced after a task that raised (the browser may be what is
+# stuck), and restarted after recycle_after tasks so a long-running process
+# doesn't accumulate Firefox's memory growth.
+#
+# Firefox only lets WebDriver change preferences at startup (changing them
+# later needs privileged scripts that current Firefox refuses by default),
+# so each browser gets its own download directory when it starts. It is
+# emptied before every task; a task moves what it downloaded out of it.
+
+# MIME types the browsers save without asking
+DOWNLOAD_TYPES = ('application/vnd.openxmlformats-officedocument'
+                  '.spreadsheetml.sheet')
+
+PAGE_LOAD_TIMEOUT = 60
+
+
+def new_firefox(download_dir: str) -> 'Firefox':
+    """Start a headless Firefox that saves downloads to download_dir."""
+    from selenium import webdriver
+
+    options = webdriver.FirefoxOptions()
+    options.add_argument("--headless")
+    options.set_preference("browser.download.folderList", 2)
+    options.set_preference("browser.download.dir", download_dir)
+    options.set_preference("browser.download.useDownloadDir", True)
+    options.set_preference("browser.helperApps.neverAsk.saveToDisk",
+                           DOWNLOAD_TYPES)
+    driver = webdriver.Firefox(options=options)
+    # Don't let one hung page load hold a session forever
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+
+def _quit(driver: 'Firefox') -> None:
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.warning(f"Browser didn't quit cleanly: {e}")
+
+
+def _empty(directory: str) -> None:
+    """Delete whatever an earlier task left in a download directory."""
+    for path in Path(directory).iterdir():
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+
+def _healthy(driver: 'Firefox') -> bool:
+    """Whether the browser still answers WebDriver commands."""
+    try:
+        driver.execute_script('return 1')
+        return True
+    except Exception:
+        return False
+
+
+class BrowserPool:
+    """Up to size warm browsers, handed out one task at a time."""
+
+    def __init__(self, size: int = 1, recycle_after: int = 50,
+                 new_driver: Callable[[str], 'Firefox'] = new_firefox
+                 ) -> None:
+        self.size = size
+        self.recycle_after = recycle_after
+        self.new_driver = new_driver
+        self._idle: list['Firefox'] = []
+        self._uses: dict[int, int] = {}
+        self._download_dirs: dict[int, str] = {}
+        self._running = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+    def resize(self, size: int) -> None:
+        """Allow at least size browsers."""
+        with self._available:
+            self.size = max(self.size, size)
+            self._available.notify_all()
+
+    def _checkout(self) -> 'Firefox':
+        driver: 'Firefox | None'
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError('The browser pool is closed')
+                if self._idle:
+                    driver = self._idle.pop()
+                    break
+                if self._running < self.size:
+                    self._running += 1
+                    driver = None
+                    break
+                self._available.wait()
+
+        if driver is not None:
+            if _healthy(driver):
+                return driver
+            logging.warning('Browser stopped responding, starting a new one')
+            self._discard(driver)
+        download_dir = tempfile.mkdtemp(prefix='trade-analysis-downloads-')
+        try:
+            driver = self.new_driver(download_dir)
+        except BaseException:
+            shutil.rmtree(download_dir, ignore_errors=True)
+            with self._available:
+                self._running -= 1
+                self._available.notify()
+            raise
+        with self._available:
+            self._download_dirs[id(driver)] = download_dir
+        return driver
+
+    def _discard(self, driver: 'Firefox') -> None:
+        """Quit a browser and remove its download directory."""
+        _quit(driver)
+        with self._available:
+            self._uses.pop(id(driver), None)
+            download_dir = self._download_dirs.pop(id(driver), None)
+        if download_dir is not None:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+    def download_dir(self, driver: 'Firefox') -> str:
+        """The directory a browser from this pool saves downloads to."""
+        with self._available:
+            return self._download_dirs[id(driver)]
+
+    def _release(self, driver: 'Firefox', broken: bool) -> None:
+        with self._available:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            keep = not (broken or self._closed or uses >= self.recycle_after)
+            if keep:
+                self._idle.append(driver)
+            else:
+                self._running -= 1
+            self._available.notify()
+        if not keep:
+            self._discard(driver)
+
+    @contextmanager
+    def session(self) -> Iterator['Firefox']:
+        """Check out a browser for one task.
+
+        The browser's download directory (download_dir()) starts out
+        empty. A browser whose task raised is replaced rather than reused.
+        """
+        driver = self._checkout()
+        broken = True
+        try:
+            _empty(self.download_dir(driver))
+            yield driver
+            broken = False
+        finally:
+            self._release(driver, broken)
+
+    def close(self) -> None:
+        """Quit the idle browsers; browsers in use quit when released."""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+            self._available.notify_all()
+        for driver in idle:
+            self._discard(driver)
+
+
+_shared: BrowserPool | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool(size: int = 1) -> BrowserPool:
+    """The process-wide pool, allowing at least size browsers.
+
+    It is started on first use and closed at exit, or earlier with
+    close_shared_pool().
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared._closed:
+            _shared = BrowserPool(size)
+            atexit.register(_shared.close)
+        else:
+            _shared.resize(size)
+        return _shared
+
+
+def close_shared_pool() -> None:
+    """Quit the process-wide pool's browsers, if it was ever started."""
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+from pathlib import Path
+
+# Root directory for everything the scripts persist between runs. Override
+# with the TRADE_ANALYSIS_CACHE environment variable.
+CACHE_DIR: Path = Path(os.environ.get(
+    'TRADE_ANALYSIS_CACHE', Path.home() / '.cache' / 'trade-analysis'))
+
+
+def file_sha256(path: str | Path) -> str:
+    """Return the hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def evict_oldest(directory: Path, pattern: str, keep: int) -> None:
+    """Delete all but the keep most recently modified files matching pattern."""
+    files = sorted(directory.glob(pattern), key=lambda p: p.stat().st_mtime)
+    for path in files[:-keep] if keep > 0 else files:
+        path.unlink(missing_ok=True)
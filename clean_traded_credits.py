@@ -1,11 +1,10 @@
 #!/usr/bin/env python3
 
-from typing import Any
-
 import pandas as pd
-from thefuzz import process
 from datetime import datetime
 import argparse
+from cma_names import canonicalize_cmas
+from trade_data import read_hu_sheet
 
 # Call argparse and define the arguments
 parser = argparse.ArgumentParser(description='Process NVCR trading information'
@@ -26,16 +25,13 @@ trade_data = args.input
 hu_output_file = ('~/Documents/Trade Analysis/Full-HU-Traded-Credits-{}.csv')
 shu_output_file = ('~/Documents/Trade Analysis/Full-SHU-Traded-Credits-{}.csv')
 
-# Open the Excel file. Quit if not FileNotFoundError
+# Grab the HU tab. Quit if not FileNotFoundError
 try:
-    trade_df = pd.ExcelFile(trade_data)
+    hu_df = read_hu_sheet(trade_data)
 except FileNotFoundError as e:
     print("Excel file not found: ", e)
     exit()
 
-# Grab the HU tab
-hu_df = trade_df.parse('Trade Prices by HU')
-
 # Rename the columns to something usable
 hu_df = hu_df.set_axis(['date', 'cma', 'sbv', 'ghu', 'lt', 'sbu', 'ghu_price',\
                 'shu_price', 'species', 'price_in_gst', 'price_ex_gst',\
@@ -65,21 +61,10 @@ for x in ['sbv', 'ghu', 'lt', 'ghu_price', 'price_in_gst', 'price_ex_gst']:
 # Make sure all LTs are integers
 hu_df['lt'] = hu_df['lt'].map(int)
 
-choices = ['Corangamite', 'Port Phillip and Westernport', 'Melbourne Water',
-           'Wimmera', 'Glenelg Hopkins', 'Goulburn Broken', 'West Gippsland',
-           'East Gippsland', 'Mallee', 'North Central', 'North East']
-
 # Clean up all the inconsistancies in CMA names
-def fix_cmas(row: pd.Series) -> str:
-    result = process.extractOne(row['cma'], choices)  # type: ignore[attr-defined]
-    if result is None:
-        return str(row['cma'])
-    return str(result[0])
-
-hu_df['cma'] = hu_df.apply(lambda row: fix_cmas(row), axis=1)
-
-# Change PPWP to Melbourne Water
-hu_df = hu_df.replace('Port Phillip and Westernport', 'Melbourne Water')
+hu_df['cma'], new_spellings = canonicalize_cmas(hu_df['cma'])
+if new_spellings:
+    print(f'New CMA spellings matched this run: {new_spellings}')
 
 hu_df['date'] = pd.to_datetime(hu_df['date'])
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from cache import CACHE_DIR
+
+# Every CMA name the NVCR has used. Order matters: thefuzz breaks score ties
+# on the first choice.
+CMA_CHOICES: list[str] = [
+    'Corangamite', 'Melbourne Water', 'Port Phillip and Westernport',
+    'Wimmera', 'Glenelg Hopkins', 'Goulburn Broken', 'West Gippsland',
+    'East Gippsland', 'Mallee', 'North Central', 'North East'
+    ]
+
+# Old CMA names that are reported under their current name
+CMA_FOLDS: dict[str, str] = {
+    'Port Phillip and Westernport': 'Melbourne Water'
+    }
+
+ALIAS_FILE: Path = CACHE_DIR / 'cma_aliases.json'
+
+
+def load_aliases(alias_file: Path = ALIAS_FILE) -> dict[str, str]:
+    """Load the raw spelling -> canonical CMA table saved by earlier runs.
+
+    The table is discarded if it was built against a different choice list.
+    """
+    try:
+        with open(alias_file) as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if stored.get('choices') != CMA_CHOICES:
+        return {}
+    aliases: dict[str, str] = stored.get('aliases', {})
+    return aliases
+
+
+def save_aliases(aliases: dict[str, str],
+                 alias_file: Path = ALIAS_FILE) -> None:
+    """Write the alias table so the next run can skip fuzzy matching."""
+    alias_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(alias_file, 'w') as f:
+        json.dump({'choices': CMA_CHOICES, 'aliases': aliases}, f,
+                  indent=2, sort_keys=True)
+
+
+def match_cma(raw: str) -> str:
+    """Fuzzy match one raw CMA spelling to its canonical, folded name."""
+    # Only needed for spellings missing from the alias table
+    from thefuzz import process
+
+    result = process.extractOne(raw, CMA_CHOICES)  # type: ignore[attr-defined]
+    name = raw if result is None else str(result[0])
+    return CMA_FOLDS.get(name, name)
+
+
+def canonicalize_cmas(cmas: pd.Series,
+                      alias_file: Path | None = ALIAS_FILE
+                      ) -> tuple[pd.Series, list[str]]:
+    """Map a column of raw CMA names to canonical CMA names.
+
+    Each distinct spelling not already in the alias table is fuzzy matched
+    once, then the whole column is mapped in one pass. Returns the mapped
+    column, as a categorical, and the spellings that were new in this
+    run. Pass alias_file=None to match without reading or writing the
+    alias table.
+    """
+    raw: pd.Series = cmas.map(str)
+    aliases = load_aliases(alias_file) if alias_file is not None else {}
+
+    new_spellings: list[str] = [
+        x for x in pd.unique(raw) if x not in aliases]
+    for x in new_spellings:
+        aliases[x] = match_cma(x)
+
+    if new_spellings and alias_file is not None:
+        save_aliases(aliases, alias_file)
+
+    return raw.map(aliases).astype('category'), new_spellings
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Reading the input workbooks. calamine parses the file in Rust and is
+# used when python-calamine is installed. Otherwise openpyxl streams the
+# sheet in read-only mode, and only the requested columns are turned into
+# Python objects.
+
+# Engines in order of preference, and the module each needs
+ENGINES: dict[str, str] = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+    }
+
+# A sheet's columns: the first n columns, or columns picked by header name
+Columns = int | list[str]
+
+
+def excel_engine() -> str:
+    """The fastest installed engine."""
+    for engine, module in ENGINES.items():
+        if importlib.util.find_spec(module) is not None:
+            return engine
+    return 'openpyxl'
+
+
+def _usecols(columns: Columns) -> list[int] | list[str]:
+    return list(range(columns)) if isinstance(columns, int) else columns
+
+
+def _to_frame(rows: list[tuple], header: tuple) -> pd.DataFrame:
+    """Build a frame from worksheet rows the way read_excel would."""
+    # Trailing blank rows are dropped, like read_excel does
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()
+    names = [f'Unnamed: {i}' if name is None else name
+             for i, name in enumerate(header)]
+    df = pd.DataFrame(rows, columns=names).infer_objects()
+    # Empty cells are NaN rather than None, as read_excel gives them
+    text = df.columns[df.dtypes == object]
+    df[text] = df[text].where(df[text].notna(), np.nan)
+    return df
+
+
+def _read_openpyxl(workbook: str | Path, sheets: list[str] | None,
+                   columns: Columns) -> dict[str, pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(workbook, read_only=True, data_only=True,
+                       keep_links=False)
+    try:
+        frames = {}
+        for name in sheets or wb.sheetnames:
+            rows = wb[name].iter_rows(
+                max_col=columns if isinstance(columns, int) else None,
+                values_only=True)
+            header = next(rows, ())
+            if isinstance(columns, int):
+                header = tuple(header) + (None,) * (columns - len(header))
+                data = [tuple(r) + (None,) * (columns - len(r)) for r in rows]
+            else:
+                missing = set(columns) - set(header)
+                if missing:
+                    raise ValueError(f"Sheet '{name}' has no column(s) "
+                                     f"{sorted(missing)}")
+                picks = [header.index(c) for c in columns]
+                header = tuple(columns)
+                data = [tuple(r[i] if i < len(r) else None for i in picks)
+                        for r in rows]
+            frames[name] = _to_frame(data, header)
+        return frames
+    finally:
+        wb.close()
+
+
+def read_sheets(workbook: str | Path, sheets: list[str] | None,
+                columns: Columns,
+                engine: str | None = None) -> dict[str, pd.DataFrame]:
+    """Read some columns of the named sheets, or of every sheet if None."""
+    engine = engine or excel_engine()
+    if engine == 'openpyxl':
+        return _read_openpyxl(workbook, sheets, columns)
+    frames: dict[str, pd.DataFrame] = pd.read_excel(
+        workbook, sheet_name=sheets, usecols=_usecols(columns), engine=engine)
+    return frames
+
+
+def read_sheet(workbook: str | Path, sheet: str, columns: Columns,
+               engine: str | None = None) -> pd.DataFrame:
+    """Read some columns of one sheet."""
+    return read_sheets(workbook, [sheet], columns, engine)[sheet]
@@ -24,7 +24,10 @@
               requests
               lxml
               xlsxwriter
-            ]);
+              pyarrow
+            ]
+            # Optional: faster workbook reading (excel_reader.py)
+            ++ lib.optional (p ? python-calamine) p.python-calamine);
 
           runtimeDeps = [ pkgs.firefox pkgs.geckodriver ];
         in {
@@ -5,67 +5,125 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
-import time
 from bs4 import BeautifulSoup
 import pandas as pd
 import copy
 from datetime import datetime
 import argparse
 from io import StringIO
+import queue
+import threading
+from browser_pool import BrowserPool, shared_pool
 
+SEARCH_URL = "https://nvcr.delwp.vic.gov.au/Search/GHU"
 
-def get_supply() -> dict[str, pd.DataFrame]:
-    opts = webdriver.FirefoxOptions()
-    opts.add_argument("--headless")
-    driver = webdriver.Firefox(options = opts)
-    wait = WebDriverWait(driver, timeout=10)
-
-    cmas = ['Corangamite', 'Melbourne Water', 'Wimmera', \
-            'Glenelg Hopkins', 'Goulburn Broken', 'West Gippsland', \
-            'East Gippsland', 'Mallee', 'North Central', 'North East']
-
-    all_supply: dict[str, pd.DataFrame] = {}
+CMAS = ['Corangamite', 'Melbourne Water', 'Wimmera', \
+        'Glenelg Hopkins', 'Goulburn Broken', 'West Gippsland', \
+        'East Gippsland', 'Mallee', 'North Central', 'North East']
 
-    for x in cmas:
-        print('Scraping supply data for:', x, '...\n')
-        driver.get("https://nvcr.delwp.vic.gov.au/Search/GHU")
-        
-        wait.until(EC.element_to_be_clickable((By.XPATH, 
-                '//*[@id="GeneralGuidelineSearch"]/div[2]/div[1]/div/input')))
-        
-        ghu_element = driver.find_element(By.XPATH, 
-                '//*[@id="GeneralGuidelineSearch"]/div[2]/div[1]/div/input')
-        sbv_element = driver.find_element(By.XPATH, 
-                '//*[@id="GeneralGuidelineSearch"]/div[2]/div[2]/div/input')
-        lt_element = driver.find_element(By.XPATH, 
-                '//*[@id="GeneralGuidelineSearch"]/div[2]/div[3]/div/input')
-        search_button = driver.find_element(By.XPATH, 
-                '//*[@id="GeneralGuidelineSearch"]/div[2]/div[7]/div[2]/button')
 
-        cma_select = Select(driver.find_element(By.XPATH, 
-                '//*[@id="GeneralGuidelineSearch"]/div[2]/div[5]'
-                '/div/table/tbody/tr/td[2]/div[2]/select'))
-
-        ghu_element.send_keys("0.001")
-        sbv_element.send_keys("0.001")
-        lt_element.send_keys("0")
+def _scrape_cma(driver: webdriver.Firefox, cma: str) -> pd.DataFrame:
+    """Run the GHU search for one CMA and return its supply table."""
+    wait = WebDriverWait(driver, timeout=10)
 
-        cma_select.select_by_value(x)
+    driver.get(SEARCH_URL)
+
+    wait.until(EC.element_to_be_clickable((By.XPATH, 
+            '//*[@id="GeneralGuidelineSearch"]/div[2]/div[1]/div/input')))
+    
+    ghu_element = driver.find_element(By.XPATH, 
+            '//*[@id="GeneralGuidelineSearch"]/div[2]/div[1]/div/input')
+    sbv_element = driver.find_element(By.XPATH, 
+            '//*[@id="GeneralGuidelineSearch"]/div[2]/div[2]/div/input')
+    lt_element = driver.find_element(By.XPATH, 
+            '//*[@id="GeneralGuidelineSearch"]/div[2]/div[3]/div/input')
+    search_button = driver.find_element(By.XPATH, 
+            '//*[@id="GeneralGuidelineSearch"]/div[2]/div[7]/div[2]/button')
+
+    cma_select = Select(driver.find_element(By.XPATH, 
+            '//*[@id="GeneralGuidelineSearch"]/div[2]/div[5]'
+            '/div/table/tbody/tr/td[2]/div[2]/select'))
+
+    ghu_element.send_keys("0.001")
+    sbv_element.send_keys("0.001")
+    lt_element.send_keys("0")
+
+    cma_select.select_by_value(cma)
+
+    search_button.click()
+
+    wait.until(EC.element_to_be_clickable((By.XPATH,
+            '/html/body/div[3]/div[1]/div[3]/div[7]/div[3]/label')))
+
+    html = driver.page_source
+    soup = BeautifulSoup(html, 'html.parser')
+    div = soup.find_all("table", {"class":"table"})
+    all_tables = pd.read_html(StringIO(str(div)))
+    return copy.deepcopy(all_tables[4])
+
+
+def _supply_worker(todo: 'queue.Queue[tuple[str, int]]',
+                   all_supply: dict[str, pd.DataFrame],
+                   failed: dict[str, Exception],
+                   retries: int, pool: BrowserPool) -> None:
+    """Pull CMAs off the queue and scrape each with a browser from the pool.
+
+    A CMA that fails is put back on the queue until it has used up its
+    retries. The pool replaces the browser after a failure in case it is
+    the browser that is stuck.
+    """
+    while True:
+        try:
+            cma, attempt = todo.get_nowait()
+        except queue.Empty:
+            return
+        print('Scraping supply data for:', cma, '...\n')
+        try:
+            with pool.session() as driver:
+                all_supply[cma] = _scrape_cma(driver, cma)
+            failed.pop(cma, None)
+        except Exception as e:
+            failed[cma] = e
+            print(f'Scraping {cma} failed (attempt {attempt + 1}): {e}\n')
+            if attempt < retries:
+                todo.put((cma, attempt + 1))
+
+
+def get_supply(workers: int = 1, retries: int = 1,
+               pool: BrowserPool | None = None) -> dict[str, pd.DataFrame]:
+    """Scrape the GHU supply table for every CMA.
+
+    With workers > 1 the workers pull CMAs from a shared queue, each
+    scraping in its own warm browser from the pool (by default the
+    process-wide pool). A CMA that still fails after its retries is left
+    out of the result instead of aborting the whole run.
+    """
+    workers = max(1, min(workers, len(CMAS)))
+    pool = pool or shared_pool(workers)
+    todo: queue.Queue[tuple[str, int]] = queue.Queue()
+    for x in CMAS:
+        todo.put((x, 0))
 
-        search_button.click()
+    all_supply: dict[str, pd.DataFrame] = {}
+    failed: dict[str, Exception] = {}
 
-        wait.until(EC.element_to_be_clickable((By.XPATH,
-                '/html/body/div[3]/div[1]/div[3]/div[7]/div[3]/label')))
+    threads = [threading.Thread(target=_supply_worker,
+                                args=(todo, all_supply, failed, retries,
+                                      pool))
+               for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
 
-        html = driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
-        div = soup.find_all("table", {"class":"table"})
-        all_tables = pd.read_html(StringIO(str(div)))
-        all_supply[x] = copy.deepcopy(all_tables[4])
+    for cma, e in failed.items():
+        print(f'No supply data for {cma}: {e}\n')
 
-    driver.quit()
+    if not all_supply:
+        raise RuntimeError('Supply scraping failed for every CMA.')
 
-    return all_supply
+    # Keep the CMAs in their usual order
+    return {x: all_supply[x] for x in CMAS if x in all_supply}
 
 
 if __name__ == "__main__":
@@ -76,11 +134,14 @@ if __name__ == "__main__":
                         help='The name of the file you would like to write the '
                             'supply data to. Default is "Supply_{timestamp}.xlsx" in '
                             'the current directory')
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help='Number of headless browsers to scrape with in '
+                            'parallel. Default is 1')
 
     args = parser.parse_args()
 
     # Get supply data as dict of DataFrames
-    all_supply = get_supply()
+    all_supply = get_supply(workers=args.workers)
 
     # Write to Excel file
     supply_xlsx = args.output.format(datetime.now().strftime("%Y%m%d_%H%M%S"))
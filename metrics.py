@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+# Define the property IDs of the Water Authorities
+WA_SITES: dict[str, list[str]] = {
+    'Corangamite': ['BBA-2252'],
+    'Glenelg Hopkins': ['TFN-C0228 '],
+    'Melbourne Water': ['BBA-0277', 'BBA-0670', 'BBA-0677', 'BBA-0678'],
+    'West Gippsland': ['BBA-3049', 'BBA-2845', 'BBA-2839', 'BBA-2790',
+                       'BBA-2789', 'BBA-2751', 'BBA-2766', 'BBA-2623'],
+    }
+
+# Per-CMA GHU metrics, in the order they appear on each CMA sheet
+GHU_METRICS: list[str] = [
+    'Total GHUs traded', 'Total market value', 'Average price per GHU',
+    'Median price per GHU', 'Total GHUs without trees',
+    'Total value without trees', 'Average price without trees',
+    'Median price without trees', 'Floor price', 'Total LTs traded',
+    'Average LT value', 'Supply of Credits', 'Years of Supply', 'LT Supply',
+    'Water Authority Supply (WA)', 'Years of Supply without WA'
+    ]
+
+# SHU summary metrics, in the order they appear on the SHU Data sheet
+SHU_METRICS: list[str] = [
+    'Number of SHU trades', 'Total SHUs traded', 'Total Value of SHU trades',
+    'Average Price per SHU', 'SHU Floor Price', 'SHU Ceiling Price',
+    'SHU median price'
+    ]
+
+
+def supply_metrics(supply: dict[str, pd.DataFrame],
+                   wa: dict[str, list[str]] = WA_SITES) -> pd.DataFrame:
+    """Total GHU, LT and Water Authority GHU supply for each CMA."""
+    all_supply = pd.concat(
+        {cma: df[['Credit Site ID', 'GHU', 'LT']]
+         for cma, df in supply.items()},
+        names=['cma', None]).reset_index(level='cma')
+
+    wa_pairs = [(cma, site) for cma, sites in wa.items() for site in sites]
+    is_wa = pd.MultiIndex.from_arrays(
+        [all_supply['cma'], all_supply['Credit Site ID']]).isin(wa_pairs)
+
+    return all_supply.assign(wa_ghu=all_supply['GHU'].where(is_wa, 0)).groupby(
+        'cma', sort=False).agg(
+            supply=('GHU', 'sum'),
+            lt_supply=('LT', 'sum'),
+            wa_supply=('wa_ghu', 'sum'))
+
+
+def with_no_tree_columns(hu_df: pd.DataFrame) -> pd.DataFrame:
+    """Add ghu/value/price columns that only hold trades without trees.
+
+    The other rows are NaN so they drop out of sums, means and medians.
+    """
+    no_tree = hu_df['lt'] == 0
+    return hu_df.assign(
+        ghu_nt=hu_df['ghu'].where(no_tree),
+        value_nt=hu_df['price_ex_gst'].where(no_tree),
+        price_nt=hu_df['ghu_price'].where(no_tree),
+    )
+
+
+def cma_aggregates(hu_df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate the trades per CMA in one grouped aggregation.
+
+    derive_ghu_metrics() and hu_overview() both work from the result.
+    """
+    return with_no_tree_columns(hu_df).groupby('cma', observed=True).agg(
+        ghu=('ghu', 'sum'),
+        value=('price_ex_gst', 'sum'),
+        median=('ghu_price', 'median'),
+        ghu_nt=('ghu_nt', 'sum'),
+        value_nt=('value_nt', 'sum'),
+        median_nt=('price_nt', 'median'),
+        floor=('ghu_price', 'min'),
+        lt=('lt', 'sum'),
+        floor_nt=('price_nt', 'min'),
+        ceiling_nt=('price_nt', 'max'),
+        mean_nt=('price_nt', 'mean'),
+    )
+
+
+def cma_metrics(g: pd.DataFrame,
+                supply: dict[str, pd.DataFrame],
+                wa: dict[str, list[str]] = WA_SITES) -> pd.DataFrame:
+    """Compute every per-CMA GHU metric from cma_aggregates() output.
+
+    Returns a table with one row per CMA in g and one column per entry
+    of GHU_METRICS. CMAs without supply data get missing supply metrics.
+    """
+    s = supply_metrics(supply, wa).reindex(g.index)
+    for cma in s.index[s['supply'].isna()]:
+        print(f"No supply data for {cma}.\n")
+
+    return derive_ghu_metrics(g, s)
+
+
+def derive_ghu_metrics(g: pd.DataFrame, s: pd.DataFrame) -> pd.DataFrame:
+    """Turn aggregated trade and supply columns into the GHU_METRICS table.
+
+    g holds the per-group trade aggregates (ghu, value, median, ghu_nt,
+    value_nt, median_nt, floor, lt) and s the supply_metrics() columns,
+    aligned on the same index.
+    """
+    wa_supply = s['wa_supply'].fillna(0.0)
+    avg_nt = g['value_nt'] / g['ghu_nt']
+    metrics = pd.DataFrame({
+        'Total GHUs traded': g['ghu'],
+        'Total market value': g['value'],
+        'Average price per GHU': g['value'] / g['ghu'],
+        'Median price per GHU': g['median'],
+        'Total GHUs without trees': g['ghu_nt'],
+        'Total value without trees': g['value_nt'],
+        'Average price without trees': avg_nt,
+        'Median price without trees': g['median_nt'],
+        'Floor price': g['floor'],
+        'Total LTs traded': g['lt'],
+        # Theoretical value of a tree: (Total GHU value - ((Total GHUs -
+        # Total GHUs without trees) * Avg price without trees) - Total
+        # value without trees) / Total LTs Traded
+        'Average LT value': (g['value'] - (g['ghu'] - g['ghu_nt']) * avg_nt
+                             - g['value_nt']) / g['lt'],
+        'Supply of Credits': s['supply'],
+        'Years of Supply': s['supply'] / g['ghu'],
+        'LT Supply': s['lt_supply'],
+        'Water Authority Supply (WA)': wa_supply,
+        'Years of Supply without WA': (s['supply'] - wa_supply) / g['ghu'],
+    })
+    return metrics[GHU_METRICS]
+
+
+def hu_overview(g: pd.DataFrame, metrics_df: pd.DataFrame) -> pd.DataFrame:
+    """Build the HU Summary table: one row per CMA.
+
+    Totals and no-tree price statistics come from the cma_aggregates()
+    table g, so the trades aren't aggregated again. Supply is joined from
+    the cma_metrics() table.
+    """
+    overview = g[['ghu', 'lt', 'value', 'floor_nt', 'ceiling_nt', 'mean_nt',
+                  'median_nt']].copy()
+    overview['weighted_average'] = overview['value'] / overview['ghu']
+    overview = overview.join(metrics_df[['Supply of Credits', 'LT Supply']])
+    return overview.reset_index()
+
+
+# Function to generate SHU summary from a filtered DataFrame
+def create_shu_summary(filtered_df: pd.DataFrame) -> dict[str, Any]:
+    total_sbu = filtered_df['sbu'].sum()
+    return {
+        'Number of SHU trades': filtered_df.groupby(['date', 'shu_price']).sum(numeric_only=True)['sbu'].count(),
+        'Total SHUs traded': total_sbu,
+        'Total Value of SHU trades': filtered_df['price_ex_gst'].sum(),
+        'Average Price per SHU': filtered_df['price_ex_gst'].sum() / total_sbu if total_sbu > 0 else np.nan,
+        'SHU Floor Price': filtered_df['shu_price'].min(),
+        'SHU Ceiling Price': filtered_df['shu_price'].max(),
+        'SHU median price': np.median(filtered_df['shu_price'].unique()) if not filtered_df.empty else np.nan
+    }
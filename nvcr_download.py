@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import shutil
+import struct
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+from urllib.parse import urljoin
+
+import pandas as pd
+import requests
+
+from cache import CACHE_DIR, evict_oldest, file_sha256
+
+NVCR_URL = (
+    "https://www.environment.vic.gov.au/"
+    "native-vegetation/native-vegetation-removal-regulations"
+)
+URL_TEXT = "Traded credits information"
+
+# inotify event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+# Some servers turn away the default python-requests user agent
+HTTP_HEADERS: dict[str, str] = {
+    'User-Agent': ('Mozilla/5.0 (X11; Linux x86_64; rv:128.0) '
+                   'Gecko/20100101 Firefox/128.0')
+}
+
+# Downloaded workbooks are stored as <sha256>.xlsx. index.json maps each
+# resolved download href to the hash and validators of its last response.
+DOWNLOAD_CACHE_DIR: Path = CACHE_DIR / 'nvcr'
+
+# Number of downloaded workbooks kept in the cache
+DOWNLOAD_KEEP = 5
+
+
+def _completed_download(directory: str) -> str | None:
+    """Return a finished .xlsx in directory, or None if there isn't one yet.
+
+    Firefox creates an empty placeholder with the final name, writes the
+    data to <name>.part and renames it over the placeholder when done, so
+    a non-empty .xlsx without a .part sibling is complete.
+    """
+    for xlsx in Path(directory).glob("*.xlsx"):
+        part = xlsx.with_name(xlsx.name + ".part")
+        if not part.exists() and xlsx.stat().st_size > 0:
+            return str(xlsx)
+    return None
+
+
+def _inotify_wait(directory: str, timeout: float) -> str | None:
+    """Block on inotify until a download in directory completes.
+
+    Returns None on timeout. Raises OSError if inotify is not available.
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    try:
+        if libc.inotify_add_watch(fd, os.fsencode(directory),
+                                  IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+        # The download may have finished before the watch was added
+        deadline = time.monotonic() + timeout
+        while (file_path := _completed_download(directory)) is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                return None
+            buf = os.read(fd, 64 * 1024)
+            offset = 0
+            while offset < len(buf):
+                _, mask, _, length = struct.unpack_from("iIII", buf, offset)
+                name = buf[offset + 16:offset + 16 + length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & IN_CREATE and name.endswith(b".part"):
+                    logging.info(f"Download in progress: {os.fsdecode(name)}")
+        return file_path
+    finally:
+        os.close(fd)
+
+
+def _poll_wait(directory: str, timeout: float) -> str | None:
+    """Poll directory until a download completes. Returns None on timeout."""
+    start_time = time.time()
+
+    last_part_file = None
+    while time.time() - start_time < timeout:
+        # Check for complete downloads
+        file_path = _completed_download(directory)
+        if file_path is not None:
+            return file_path
+
+        # Check for in-progress downloads
+        part_files = list(Path(directory).glob("*.part"))
+        if part_files:
+            current_part = str(part_files[0])
+            if current_part != last_part_file:
+                logging.info(f"Download in progress: {current_part}")
+                last_part_file = current_part
+
+        time.sleep(0.5)
+    return None
+
+
+def wait_for_download(directory: str, timeout: int = 120) -> str:
+    """Wait for .xlsx file to appear in directory after Selenium download.
+
+    Uses inotify on Linux so the wait ends as soon as Firefox renames the
+    finished .part file, and falls back to polling elsewhere.
+    """
+    logging.info(f"Waiting for download in: {directory}")
+
+    try:
+        file_path = _inotify_wait(directory, timeout)
+    except (OSError, AttributeError, TypeError):
+        # No inotify on this platform (missing libc symbol or library)
+        file_path = _poll_wait(directory, timeout)
+
+    if file_path is not None:
+        logging.info(f"Download complete: {file_path}")
+        return file_path
+
+    # Timeout - log directory contents for debugging
+    all_files = list(Path(directory).iterdir())
+    logging.error(f"Download timeout. Directory contents: {[f.name for f in all_files]}")
+    raise TimeoutError(f"Download did not complete within {timeout} seconds")
+
+
+def find_download_link(html: str) -> str | None:
+    """Return the href of the first link whose text contains URL_TEXT."""
+    from bs4 import BeautifulSoup, Tag
+
+    soup = BeautifulSoup(html, "lxml")
+    for link in soup.find_all("a", href=True):
+        if not isinstance(link, Tag):
+            continue
+        if URL_TEXT in link.get_text(strip=True):
+            return str(link.get("href"))
+    return None
+
+
+def _load_index(cache_dir: Path) -> dict[str, dict[str, Any]]:
+    try:
+        with open(cache_dir / 'index.json') as f:
+            index: dict[str, dict[str, Any]] = json.load(f)
+            return index
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(index: dict[str, dict[str, Any]], cache_dir: Path) -> None:
+    tmp = cache_dir / 'index.json.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp, cache_dir / 'index.json')
+
+
+def _store(downloaded_file: str | Path, cache_dir: Path) -> tuple[Path, str]:
+    """Move a downloaded workbook into the cache under its content hash."""
+    sha = file_sha256(downloaded_file)
+    path = cache_dir / f'{sha}.xlsx'
+    if path.exists():
+        logging.info("Downloaded workbook is unchanged from the cached copy")
+        Path(downloaded_file).unlink()
+        path.touch()  # Keep recently used workbooks out of eviction
+    else:
+        shutil.move(str(downloaded_file), path)
+    return path, sha
+
+
+def evict_downloads(keep: int = DOWNLOAD_KEEP,
+                    cache_dir: Path = DOWNLOAD_CACHE_DIR) -> None:
+    """Delete all but the newest keep workbooks and their index entries."""
+    evict_oldest(cache_dir, '*.xlsx', keep)
+    index = _load_index(cache_dir)
+    kept = {href: entry for href, entry in index.items()
+            if (cache_dir / f"{entry.get('sha256')}.xlsx").exists()}
+    if kept != index:
+        _save_index(kept, cache_dir)
+
+
+def fetch_cached(href: str, cache_dir: Path = DOWNLOAD_CACHE_DIR,
+                 timeout: int = 120, keep: int = DOWNLOAD_KEEP) -> Path:
+    """Fetch href over HTTP into the download cache and return its path.
+
+    If the cache already holds a copy, the request carries its ETag and
+    Last-Modified validators so an unchanged file costs a 304 and no body.
+    Servers without validators are fetched in full, but an unchanged body
+    still resolves to the existing cached file. Only the newest keep
+    workbooks are kept.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index = _load_index(cache_dir)
+    entry = index.get(href, {})
+    cached = cache_dir / f"{entry.get('sha256')}.xlsx"
+
+    headers: dict[str, str] = dict(HTTP_HEADERS)
+    if entry and cached.exists():
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    with requests.get(href, headers=headers, stream=True,
+                      timeout=timeout) as response:
+        if response.status_code == 304:
+            logging.info(f"Cached workbook is current: {cached}")
+            cached.touch()  # Keep recently used workbooks out of eviction
+            return cached
+        response.raise_for_status()
+
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.part',
+                                         delete=False) as f:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                f.write(chunk)
+        path, sha = _store(f.name, cache_dir)
+
+        index[href] = {
+            'sha256': sha,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+    _save_index(index, cache_dir)
+    evict_downloads(keep, cache_dir)
+    logging.info(f"Workbook cached at: {path}")
+    return path
+
+
+def _download_nvcr_file(page_url: str = NVCR_URL,
+                        cache_dir: Path = DOWNLOAD_CACHE_DIR) -> Path:
+    """
+    Internal helper to download NVCR trade data file using Selenium.
+    Returns path to the workbook in the download cache.
+    """
+    # Selenium is only imported when the browser is actually needed
+    from selenium.webdriver.common.by import By
+
+    from browser_pool import shared_pool
+
+    # A warm browser from the shared pool. It saves downloads to its own
+    # directory, from which the workbook is moved into the cache.
+    pool = shared_pool()
+    with pool.session() as driver:
+        # Load the NVCR page
+        driver.get(page_url)
+        time.sleep(5)  # Wait for page to fully render
+        logging.info("Page loaded, searching for download link...")
+
+        # Parse HTML to find download link
+        download_url = find_download_link(driver.page_source)
+        if download_url is None:
+            raise ValueError("Download link for traded credits not found.")
+        logging.info(f"Download link found: {download_url}")
+
+        # Fetch through the cache so an unchanged file isn't downloaded again
+        try:
+            return fetch_cached(urljoin(page_url, download_url), cache_dir)
+        except requests.RequestException as e:
+            logging.warning(f"Direct fetch failed ({e}), downloading with the browser")
+
+        # Click the link element (NOT driver.get - that blocks!)
+        link_element = driver.find_element(By.CSS_SELECTOR, f'a[href="{download_url}"]')
+        link_element.click()
+
+        # Wait for download to complete
+        downloaded_file = wait_for_download(pool.download_dir(driver))
+        logging.info(f"File downloaded to: {downloaded_file}")
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        path = _store(downloaded_file, cache_dir)[0]
+        evict_downloads(cache_dir=cache_dir)
+        return path
+
+
+def _download_nvcr_http(page_url: str = NVCR_URL,
+                        cache_dir: Path = DOWNLOAD_CACHE_DIR) -> Path:
+    """
+    Internal helper to download NVCR trade data file without a browser.
+    Fetches the NVCR page, finds the download link in the static HTML and
+    streams the workbook into the download cache.
+    """
+    response = requests.get(page_url, headers=HTTP_HEADERS, timeout=60)
+    response.raise_for_status()
+
+    download_url = find_download_link(response.text)
+    if download_url is None:
+        raise ValueError("Download link for traded credits not found.")
+    logging.info(f"Download link found: {download_url}")
+
+    # Resolve against the final URL in case the page was redirected
+    return fetch_cached(urljoin(response.url, download_url), cache_dir)
+
+
+def download_nvcr_file(page_url: str = NVCR_URL,
+                       cache_dir: Path = DOWNLOAD_CACHE_DIR,
+                       use_browser: bool = False) -> Path:
+    """Download the NVCR trade data file into the cache and return its path.
+
+    Plain HTTP is tried first. Selenium is only started if that fails or
+    use_browser is set.
+    """
+    if not use_browser:
+        try:
+            return _download_nvcr_http(page_url, cache_dir)
+        except (requests.RequestException, ValueError) as e:
+            logging.warning(f"HTTP download failed ({e}), falling back to Selenium")
+
+    return _download_nvcr_file(page_url, cache_dir)
+
+
+@lru_cache(maxsize=4)
+def _open_workbook(path: Path) -> pd.ExcelFile:
+    # Cached files are named by content hash, so the path identifies the
+    # content and an unchanged download reuses the parsed workbook
+    return pd.ExcelFile(path)
+
+
+def get_trade_data(page_url: str = NVCR_URL,
+                   cache_dir: Path = DOWNLOAD_CACHE_DIR,
+                   use_browser: bool = False) -> pd.ExcelFile:
+    """Download NVCR trade data using the download cache."""
+    logging.info("Starting get_trade_data()")
+    return _open_workbook(download_nvcr_file(page_url, cache_dir,
+                                             use_browser))
+
+
+def save_nvcr_file(output_path: str, page_url: str = NVCR_URL,
+                   cache_dir: Path = DOWNLOAD_CACHE_DIR,
+                   use_browser: bool = False) -> None:
+    """Download NVCR trade data and save to specified path without analysis."""
+    logging.info(f"Downloading NVCR trade data to: {output_path}")
+
+    # Copy to user-specified location
+    shutil.copy(download_nvcr_file(page_url, cache_dir, use_browser),
+                output_path)
+    logging.info(f"NVCR trade data saved to: {output_path}")
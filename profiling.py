@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import cProfile
+import json
+import resource
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# Stage-level profiling for --profile. Pipeline code wraps each named stage
+# in `with stage('name', rows_in=n) as s:` and sets s.rows_out. While
+# profiling is off, stage() hands back one shared record and measures
+# nothing.
+#
+# Stages may run on several threads at once: supply and trade stages run in
+# parallel (see acquisition.py). A stage's cpu_s is the CPU time of the
+# thread that ran it, not counting threads it starts, and its pstats file
+# covers only that thread too. Peak RSS is process-wide, so the counter is
+# only reset when no other thread is in a stage; stages that overlap share
+# one peak RSS figure.
+
+
+class StageRecord:
+    """Measurements of one pipeline stage."""
+
+    def __init__(self, name: str, rows_in: int | None = None) -> None:
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: int | None = None
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'wall_s': round(self.wall_s, 4),
+            'cpu_s': round(self.cpu_s, 4),
+            'peak_rss_mb': self.peak_rss_mb,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+        }
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter so it covers only one stage."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(reset: bool) -> float:
+    """Peak RSS since the last reset, or of the whole process if none."""
+    if reset:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Profiler:
+    """Collects a StageRecord for every stage run while it is enabled."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.pstats_dir: Path | None = None
+        self.records: list[StageRecord] = []
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self._profiling = False
+        # Stages in progress per thread id
+        self._active: dict[int, int] = {}
+        # Whether the peak RSS counter has been reset for a stage
+        self._rss_reset = False
+        # Guards records, _profiling and _active across threads
+        self._lock = threading.Lock()
+        self._null = StageRecord('disabled')
+
+    def enable(self, pstats_dir: Path | None = None) -> None:
+        self.enabled = True
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self.pstats_dir = pstats_dir
+        if pstats_dir is not None:
+            pstats_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None
+              ) -> Iterator[StageRecord]:
+        if not self.enabled:
+            yield self._null
+            return
+
+        record = StageRecord(name, rows_in)
+        thread = threading.get_ident()
+        with self._lock:
+            self.records.append(record)
+            index = len(self.records)
+            # Only one cProfile can run at a time; nested stages and stages
+            # on other threads meanwhile go without
+            profile = None
+            if self.pstats_dir and not self._profiling:
+                profile = cProfile.Profile()
+                self._profiling = True
+            # Resetting the counter under a stage on another thread would
+            # lose that stage's peak; share the figure since its reset
+            if not any(t != thread for t in self._active):
+                self._rss_reset = _reset_peak_rss()
+            reset = self._rss_reset
+            self._active[thread] = self._active.get(thread, 0) + 1
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.thread_time() - cpu
+            record.peak_rss_mb = _peak_rss_mb(reset)
+            with self._lock:
+                if profile:
+                    self._profiling = False
+                self._active[thread] -= 1
+                if not self._active[thread]:
+                    del self._active[thread]
+            if profile and self.pstats_dir:
+                profile.dump_stats(self.pstats_dir /
+                                   f'{index:02d}-{name}.pstats')
+
+    def report(self) -> dict[str, Any]:
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'argv': sys.argv,
+            'stages': [r.as_dict() for r in self.records],
+            'total_wall_s': round(time.perf_counter() - self._start, 4),
+            'total_cpu_s': round(time.process_time(), 4),
+            'peak_rss_mb': _peak_rss_mb(False),
+        }
+
+    def write_report(self, path: str | Path) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+# The process-wide profiler that trade_analysis.py enables with --profile
+PROFILER = Profiler()
+
+
+def stage(name: str, rows_in: int | None = None
+          ) -> AbstractContextManager[StageRecord]:
+    """Time a named stage with the process-wide profiler."""
+    return PROFILER.stage(name, rows_in)
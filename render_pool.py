@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from analysis import ReportJob, render_report
+from supply_cache import split_supply, stack_supply
+from table_export import table_dir
+
+# Parallel report rendering. xlsxwriter is single-threaded, so each report
+# is rendered in its own process. The prepared trade and supply frames are
+# written once as uncompressed Arrow IPC files that every worker memory-maps,
+# so only the jobs themselves are pickled to the workers.
+
+# Frames shared with the workers, set by _init_worker in each process
+_frames: dict[str, pd.DataFrame] = {}
+
+
+def can_fork() -> bool:
+    """Whether reports can be rendered in forked workers here.
+
+    trade_analysis.py runs at module level, so workers must be forked
+    rather than spawned (spawn would run the script again). Forking is
+    only safe on Linux: on macOS, fork isn't the default because system
+    libraries (and numpy and pyarrow once loaded) may be left in a
+    broken state in the child, and the fetching threads have run by now.
+    """
+    return (sys.platform.startswith('linux')
+            and 'fork' in multiprocessing.get_all_start_methods())
+
+
+def _write_frame(df: pd.DataFrame, path: Path) -> Path:
+    df.reset_index(drop=True).to_feather(path, compression='uncompressed')
+    return path
+
+
+def _map_frame(path: Path) -> pd.DataFrame:
+    """Memory-map an Arrow IPC file as a DataFrame.
+
+    split_blocks keeps each column in its own block, so numeric columns
+    without nulls are views of the mapped pages rather than copies.
+    """
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def _init_worker(paths: dict[str, Path]) -> None:
+    _frames.update({name: _map_frame(path) for name, path in paths.items()})
+
+
+def _render(job: ReportJob) -> str:
+    render_report(job, _frames['ghu'], _frames['shu'],
+                  split_supply(_frames['supply']))
+    if job.output_format != 'xlsx':
+        return str(table_dir(job.output))
+    return job.output
+
+
+def render_parallel(jobs: list[ReportJob], ghu_df: pd.DataFrame,
+                    shu_df: pd.DataFrame, supply: dict[str, pd.DataFrame],
+                    workers: int) -> None:
+    """Render jobs in a pool of worker processes sharing the frames."""
+    with tempfile.TemporaryDirectory(prefix='trade-analysis-') as tmpdir:
+        paths = {
+            'ghu': _write_frame(ghu_df, Path(tmpdir) / 'ghu.arrow'),
+            'shu': _write_frame(shu_df, Path(tmpdir) / 'shu.arrow'),
+            'supply': _write_frame(stack_supply(supply),
+                                   Path(tmpdir) / 'supply.arrow'),
+        }
+        # Workers are forked (see can_fork). They still read the frames
+        # from the mapped files: touching the parent's objects would copy
+        # their pages one refcount at a time.
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(paths,)) as pool:
+            for output in pool.map(_render, jobs):
+                print(f'Report written: {output}')
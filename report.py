@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+
+from collections.abc import Iterable
+from datetime import date
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import xlsxwriter
+    from xlsxwriter.format import Format
+    from xlsxwriter.worksheet import Worksheet
+
+# Every format in the report, including the ones pandas adds for headers
+# and dates, starts from this font
+DEFAULT_FONT: dict[str, Any] = {'font_name': 'Rubik Light', 'font_size': 10}
+
+CURRENCY_FORMAT = '$#,##0.00'
+
+# Date cells, as pandas' to_excel writes them
+DATE_FORMAT = 'YYYY-MM-DD'
+
+# Widths autofit() gives date cells and its widest column, in pixels
+DATE_PIXELS = 68
+AUTOFIT_MAX_PIXELS = 1790
+
+# xlsxwriter releases the trade sheets are streamed with. Streaming relies
+# on xlsxwriter internals (see _SheetStream.add_table), so other releases
+# write the trade sheets in the normal mode until tests/test_report.py has
+# been run against them and they are added here.
+STREAMING_XLSXWRITER: set[str] = {'3.2'}
+
+# Metrics shown as currency on the SHU Data summary tables
+SHU_CURRENCY_METRICS: set[str] = {
+    'Total Value of SHU trades', 'Average Price per SHU', 'SHU Floor Price',
+    'SHU Ceiling Price', 'SHU median price'
+    }
+
+# Metrics shown as currency on the per-CMA sheets
+CMA_CURRENCY_METRICS: set[str] = {
+    'Total market value', 'Average price per GHU', 'Median price per GHU',
+    'Total value without trees', 'Average price without trees',
+    'Median price without trees', 'Floor price', 'Average LT value'
+    }
+
+
+def _write_metric(worksheet: 'Worksheet', row: int, col: int, value: Any,
+                  cell_format: 'Format | None' = None) -> None:
+    """Write one metric value the way pandas' to_excel would."""
+    if pd.isna(value):
+        worksheet.write_blank(row, col, None, cell_format)
+    elif isinstance(value, (int, float, np.number)):
+        if np.isinf(value):
+            worksheet.write_string(row, col, 'inf', cell_format)
+        else:
+            worksheet.write_number(row, col, float(value), cell_format)
+    else:
+        worksheet.write(row, col, value, cell_format)
+
+
+def _write_metric_table(worksheet: 'Worksheet', startrow: int, startcol: int,
+                        metrics: pd.DataFrame, currency_metrics: set[str],
+                        currency_format: 'Format') -> None:
+    """Write a two column metric/value table, formatting currency metrics."""
+    for i, (name, value) in enumerate(metrics.itertuples(index=False)):
+        worksheet.write_string(startrow + i, startcol, str(name))
+        _write_metric(worksheet, startrow + i, startcol + 1, value,
+                      currency_format if name in currency_metrics else None)
+
+
+def can_stream() -> bool:
+    """Whether the installed xlsxwriter is one the trade sheets stream with."""
+    import xlsxwriter
+
+    release = '.'.join(xlsxwriter.__version__.split('.')[:2])
+    return release in STREAMING_XLSXWRITER
+
+
+def _pixels_to_width(pixels: float) -> float:
+    """Convert a pixel width to an Excel column width, like xlsxwriter."""
+    return (pixels - 5) / 7 if pixels > 12 else pixels / 12
+
+
+class _Unrecorded(dict):
+    """A dict that ignores assignments."""
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        pass
+
+
+class _SheetStream:
+    """Write a constant_memory worksheet row by row.
+
+    In constant_memory mode xlsxwriter flushes each row to a temp file as
+    soon as a later row is written, so cells must arrive in row order and
+    autofit() has nothing to measure. Column widths are measured here as
+    the cells go out, by the same rules autofit() uses. Column formats
+    are set up front, since a flushed cell can't pick them up later.
+    """
+
+    def __init__(self, worksheet: 'Worksheet', date_format: 'Format',
+                 column_formats: dict[int, 'Format'] | None = None) -> None:
+        from xlsxwriter.utility import xl_pixel_width
+
+        self.pixel_width = xl_pixel_width
+        self.worksheet = worksheet
+        self.date_format = date_format
+        self.pixels: dict[int, int] = {}
+        self.column_formats = column_formats or {}
+        for col, cell_format in self.column_formats.items():
+            worksheet.set_column(col, col, None, cell_format)
+
+    def _measure(self, col: int, pixels: int) -> None:
+        if pixels > self.pixels.get(col, 0):
+            self.pixels[col] = pixels
+
+    def add_table(self, first_row: int, first_col: int, last_row: int,
+                  last_col: int, options: dict[str, Any]) -> None:
+        """Add a table before its rows are written.
+
+        xlsxwriter refuses tables on constant_memory sheets because the
+        header cells may already be flushed. They aren't while no later
+        row has been written, so the check is lifted for the call. This
+        sets worksheet internals, which is why streaming is limited to
+        the xlsxwriter releases in STREAMING_XLSXWRITER.
+        """
+        button = 16 if options.get('autofilter', True) else 0
+        headers = [column['header'] for column in options.get('columns', [])]
+        for i, header in enumerate(headers):
+            # Header cells have a filter button when the table has a filter
+            self._measure(first_col + i, self.pixel_width(header) + button)
+        if not self.worksheet.constant_memory:
+            self.worksheet.add_table(first_row, first_col, last_row, last_col,
+                                     options)
+            return
+
+        # add_table() also maps every cell of the range for its overlap
+        # check, which would grow with the trades. The report's tables
+        # don't overlap, so that map is left empty.
+        table_cells = self.worksheet.table_cells
+        self.worksheet.table_cells = _Unrecorded()
+        self.worksheet.constant_memory = False
+        try:
+            self.worksheet.add_table(first_row, first_col, last_row, last_col,
+                                     options)
+        finally:
+            self.worksheet.constant_memory = True
+            self.worksheet.table_cells = table_cells
+        # The table wrote its headers as shared strings, which constant_memory
+        # rows can't hold, so they are written again as inline strings
+        for i, header in enumerate(headers):
+            self.worksheet.write_string(first_row, first_col + i, header)
+
+    def write(self, row: int, col: int, value: Any,
+              cell_format: 'Format | None' = None) -> None:
+        """Write one cell the way pandas' to_excel would."""
+        if value is None or value != value:
+            # NaN and NaT are left empty unless the cell has a format
+            if cell_format is not None:
+                self.worksheet.write_blank(row, col, None, cell_format)
+        elif isinstance(value, str):
+            self.worksheet.write_string(row, col, value, cell_format)
+            self._measure(col, self.pixel_width(value))
+        elif isinstance(value, date):
+            self.worksheet.write_datetime(row, col, value,
+                                          cell_format or self.date_format)
+            self._measure(col, DATE_PIXELS)
+        elif np.isinf(value):
+            self.worksheet.write_string(row, col, 'inf', cell_format)
+            self._measure(col, self.pixel_width('inf'))
+        else:
+            self.worksheet.write_number(row, col, value, cell_format)
+            self._measure(col, 7 * len(str(value)))
+
+    def write_rows(self, first_row: int, rows: Iterable[tuple],
+                   side_cells: dict[int, list[tuple[int, Any, 'Format | None']]]
+                   | None = None) -> None:
+        """Write rows of values from column 0, in row order.
+
+        side_cells holds (col, value, format) cells to the right of the
+        rows, keyed by row, and is merged into the row order.
+        """
+        side = dict(side_cells or {})
+        for row in sorted(r for r in side if r < first_row):
+            for col, value, cell_format in side.pop(row):
+                self.write(row, col, value, cell_format)
+        for row, values in enumerate(rows, first_row):
+            for col, value in enumerate(values):
+                self.write(row, col, value)
+            for col, value, cell_format in side.pop(row, ()):
+                self.write(row, col, value, cell_format)
+        for row in sorted(side):
+            for col, value, cell_format in side[row]:
+                self.write(row, col, value, cell_format)
+
+    def autofit(self) -> None:
+        """Set the measured column widths, keeping the column formats."""
+        max_width = min(_pixels_to_width(AUTOFIT_MAX_PIXELS), 255.0)
+        for col, pixels in self.pixels.items():
+            # Padded by 7 pixels, like Excel
+            width = min(_pixels_to_width(pixels + 7), max_width)
+            self.worksheet.set_column(col, col, width,
+                                      self.column_formats.get(col))
+
+
+def _streaming_worksheet(workbook: 'xlsxwriter.Workbook',
+                         name: str) -> 'Worksheet':
+    """Add a worksheet in xlsxwriter's constant_memory mode.
+
+    constant_memory is a workbook option in xlsxwriter. It is only on
+    while the trade sheets are added, so the small summary sheets keep
+    to_excel(), add_table() and autofit(). With an xlsxwriter release
+    streaming isn't verified for (can_stream()), it is a normal sheet.
+    """
+    if not can_stream():
+        return workbook.add_worksheet(name)
+    workbook.constant_memory = True
+    try:
+        return workbook.add_worksheet(name)
+    finally:
+        workbook.constant_memory = False
+
+
+def _metric_cells(startrow: int, startcol: int, metrics: pd.DataFrame,
+                  currency_metrics: set[str], currency_format: 'Format'
+                  ) -> dict[int, list[tuple[int, Any, 'Format | None']]]:
+    """The cells of a two column metric/value table, keyed by row."""
+    cells: dict[int, list[tuple[int, Any, 'Format | None']]] = {}
+    for i, (name, value) in enumerate(metrics.itertuples(index=False)):
+        if isinstance(value, (int, float, np.number)):
+            value = float(value)
+        cells[startrow + i] = [
+            (startcol, str(name), None),
+            (startcol + 1, value,
+             currency_format if name in currency_metrics else None)]
+    return cells
+
+
+def write_report(output_file: str,
+                 hu_df: pd.DataFrame,
+                 shu_df: pd.DataFrame,
+                 shu_summary_df_3y: pd.DataFrame,
+                 shu_summary_df_1y: pd.DataFrame,
+                 hu_summary: pd.DataFrame,
+                 metrics_df: pd.DataFrame) -> None:
+    """Write the trade analysis workbook in a single pass.
+
+    Fonts and number formats are applied by xlsxwriter as each sheet is
+    written, so the finished file never has to be reopened. The HU Data
+    and SHU Data sheets grow with the trade history and are streamed
+    row by row (see _SheetStream), so memory doesn't grow with them.
+    """
+    writer = pd.ExcelWriter(output_file,
+                        engine='xlsxwriter',
+                        engine_kwargs={'options':{
+                            'strings_to_formulas': False,
+                            'default_format_properties': DEFAULT_FONT}})
+
+    xlsx_workbook_raw = writer.book
+    assert xlsx_workbook_raw is not None, "ExcelWriter workbook should not be None with xlsxwriter engine"
+    xlsx_workbook: 'xlsxwriter.Workbook' = xlsx_workbook_raw  # type: ignore[assignment]
+
+    # Define the different formats
+
+    currency_format = xlsx_workbook.add_format(
+        {
+            'num_format': CURRENCY_FORMAT
+        }
+    )
+
+    # The date format pandas' to_excel uses
+    date_format = xlsx_workbook.add_format({'num_format': DATE_FORMAT})
+
+    # Writing the HU information --------------------------------------------
+    sheetname = 'HU Data'
+    # Get the dimensions of the dataframe.
+    (max_row, max_col) = hu_df.shape
+
+    # Currency format on pricing columns
+    stream = _SheetStream(_streaming_worksheet(xlsx_workbook, sheetname),
+                          date_format,
+                          {col: currency_format
+                           for col in range(max_col - 3, max_col)})
+
+    # Create some human readable headers
+    header = ('Date', 'CMA', 'SBV', 'GHU', 'LT', 'GHU Price',
+                 'Price (in GST)', 'Price (ex GST)')
+
+    column_settings = [{"header": column} for column in header]
+
+    # Add the Excel table structure. It writes the headers, so it goes
+    # before the data.
+    stream.add_table(0, 0, max_row, max_col - 1,
+                     {
+                         'columns': column_settings,
+                         'style': 'Table Style Light 11',
+                         'banded_columns': True
+                     })
+
+    # Write the HU dataframe to sheet HU Data
+    stream.write_rows(1, hu_df.itertuples(index=False, name=None))
+
+    # Autofit columns
+    stream.autofit()
+
+    # End HU dataframe ------------------------------------------------------
+
+    # Start - Writing SHU information to file -------------------------------
+    sheetname = 'SHU Data'
+    # Get the dimensions of the dataframe.
+    (max_row, max_col) = shu_df.shape
+
+    # Currency format on pricing columns
+    stream = _SheetStream(_streaming_worksheet(xlsx_workbook, sheetname),
+                          date_format,
+                          {3: currency_format, max_col - 2: currency_format,
+                           max_col - 1: currency_format})
+
+    # Create some human readable headers
+    header = ('Date', 'LT',	'SHUs',	'SHU Price', 'Species',
+                  'Price (in GST)', 'Price (ex GST)')
+
+    column_settings = [{"header": column} for column in header]
+
+    # Add the Excel table structure before the data
+    stream.add_table(0, 0, max_row, max_col - 1,
+                     {
+                         'columns': column_settings,
+                         'style': 'Table Style Light 11',
+                         'banded_columns': True
+                     })
+
+    # Get the dimensions of the 3 year SHU Summary dataframe.
+    (max_row, max_col) = shu_summary_df_3y.shape
+
+    # The 3 year and 1 year SHU Summary tables sit beside the SHU trades,
+    # each under a heading
+    summary_cells = {0: [(8, '3 Year SHU Summary', None)],
+                     max_row + 2: [(8, '1 Year SHU Summary', None)]}
+    summary_cells |= _metric_cells(1, 8, shu_summary_df_3y,
+                                   SHU_CURRENCY_METRICS, currency_format)
+    summary_cells |= _metric_cells(max_row + 3, 8, shu_summary_df_1y,
+                                   SHU_CURRENCY_METRICS, currency_format)
+
+    # Add the Excel table structure for the summaries
+    stream.add_table(1, 8, max_row, max_col + 8 - 1,
+                     {
+                         'style': 'Table Style Light 18',
+                         'autofilter': False,
+                         'header_row': False,
+                         'first_column': True
+                     })
+
+    stream.add_table(max_row + 3, 8, 2 * max_row + 2, max_col + 8 - 1,
+                     {
+                         'style': 'Table Style Light 18',
+                         'autofilter': False,
+                         'header_row': False,
+                         'first_column': True
+                     })
+
+    # Write the SHU dataframe and the summaries to sheet SHU Data
+    stream.write_rows(1, shu_df.itertuples(index=False, name=None),
+                      summary_cells)
+
+    # Autofit columns
+    stream.autofit()
+    # End SHU dataframe -----------------------------------------------------
+
+    # Overview Summary Dataframe --------------------------------------------
+    sheetname = 'HU Summary'
+
+    # Write it to Excel
+    hu_summary.to_excel(writer, sheet_name=sheetname)
+
+    # Create some human readable headers
+    header = ('Index', 'CMA', 'GHUs', 'LTs', 'Total Value', 'GHU Floor Price',
+                         'GHU Ceiling Price', 'GHU Mean', 'GHU Median',
+                         'GHU Weighted Average', 'Available GHUs', 'Avalable LTs')
+
+    column_settings = [{"header": column} for column in header]
+
+    # Get the dimensions of the dataframe.
+    (max_row, max_col) = hu_summary.shape
+
+    # Set the active sheet to SHU Data
+    worksheet = writer.sheets[sheetname]
+
+    # Add the Excel table structure. Pandas added the data.
+    worksheet.add_table(0, 0, max_row, max_col,
+                        {
+                            'columns': column_settings,
+                            'style': 'Table Style Light 11',
+                            'banded_columns': True
+                        })
+
+    # Set currency format on pricing columns
+    worksheet.set_column(max_col - 4, max_col - 2, None, currency_format)
+
+    # Autofit columns
+    worksheet.autofit()
+
+    # End Overview Summary data ---------------------------------------------
+
+    # One sheet per CMA, rendered from its row of the metrics table
+    for cma, values in metrics_df.iterrows():
+        worksheet = xlsx_workbook.add_worksheet(str(cma))
+        summary_df = values.reset_index()
+        _write_metric_table(worksheet, 1, 0, summary_df,
+                            CMA_CURRENCY_METRICS, currency_format)
+
+        # Get the dimensions of the dataframe.
+        (max_row, max_col) = summary_df.shape
+
+        # Create some human readable headers
+        header = ('Metric', 'Value')
+        column_settings = [{"header": column} for column in header]
+
+        # Add the Excel table structure. The table writes the headers.
+        worksheet.add_table(0, 0, max_row, max_col - 1,
+                            {
+                                'columns': column_settings,
+                                'style': 'Table Style Light 11',
+                                'banded_columns': True,
+                                'autofilter': False
+                            })
+        worksheet.autofit()
+
+    writer.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import sys
+from functools import lru_cache
+
+import pandas as pd
+
+
+@lru_cache(maxsize=None)
+def parse_species(species_str: str) -> tuple[str, tuple[str, ...]]:
+    """Parse one NVCR species string into its base and alternate species.
+
+    The base species is the first name before any '(' or ','. The
+    alternates are every other name in the comma-separated main list, plus
+    the names inside the parentheses once the GHU/SHU unit text is removed.
+    Each distinct string is only parsed once; the names are interned.
+    """
+    species_str = species_str.strip()
+
+    # Take the first part before '(' or ','
+    base = sys.intern(species_str.split('(')[0].split(',')[0].strip())
+
+    all_species: set[str] = set()
+
+    # Extract main species (comma-separated list before any parenthesis)
+    main_part = species_str.split('(')[0].strip()
+    for sp in main_part.split(','):
+        sp = sp.strip()
+        if sp:
+            all_species.add(sp)
+
+    # Extract alternate species from parentheses if present
+    if '(' in species_str:
+        try:
+            paren_content = species_str[species_str.index('(')+1:species_str.rindex(')')]
+            # Extract species after unit indicators like "GHU", "SHU"
+            for part in paren_content.split(';'):
+                # Remove GHU/SHU unit information and numbers
+                cleaned = part.split('GHU')[0].split('SHU')[0].strip()
+                for sp in cleaned.split(','):
+                    sp = sp.strip()
+                    # Skip entries that start with numbers or are empty
+                    if sp and not sp[0].isdigit():
+                        all_species.add(sp)
+        except (ValueError, IndexError):
+            pass
+
+    all_species.discard(base)
+    return base, tuple(sys.intern(sp) for sp in sorted(all_species))
+
+
+def species_columns(species: pd.Series) -> pd.DataFrame:
+    """Parse a species column into categorical base and alternate columns.
+
+    Returns a frame aligned with species holding 'base_species' and
+    'alt_species' (the alternates joined with ', '). Missing species
+    parse to an empty base and no alternates.
+    """
+    codes, uniques = pd.factorize(species, use_na_sentinel=False)
+    parsed = [parse_species('' if pd.isna(x) else str(x)) for x in uniques]
+
+    def categorical(values: list[str]) -> pd.Categorical:
+        categories = sorted(set(values))
+        # Each row's value, looked up through its species code
+        lookup = pd.Index(categories).get_indexer(values)
+        return pd.Categorical.from_codes(lookup[codes], categories)
+
+    return pd.DataFrame({
+        'base_species': categorical([base for base, _ in parsed]),
+        'alt_species': categorical([', '.join(alt) for _, alt in parsed]),
+    }, index=species.index)
+
+
+def combine_species(base: str, alts: tuple[str, ...]) -> str:
+    """Join a base species and its alternates into one sorted list."""
+    return ', '.join(sorted({base, *alts} - {''}))
+
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from cache import CACHE_DIR, evict_oldest, file_sha256
+from excel_reader import read_sheets
+
+SUPPLY_CACHE_DIR: Path = CACHE_DIR / 'supply'
+
+# Snapshot file names: scrape-<timestamp>.parquet for scraped supply and
+# file-<sha256>.parquet for supply workbooks passed with --supply
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+# The only supply columns the metrics use; supply workbooks are read
+# without the rest
+SUPPLY_COLUMNS: list[str] = ['Credit Site ID', 'GHU', 'LT']
+
+# Column holding the CMA name when all the per-CMA frames share one file
+CMA_COLUMN = '_cma'
+
+
+def stack_supply(supply: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Stack the per-CMA supply frames into one Parquet and Arrow friendly frame."""
+    frames = []
+    for cma, df in supply.items():
+        df = df.copy()
+        df.columns = [str(c) for c in df.columns]
+        # Scraped tables mix numbers and text in some columns, which
+        # Parquet can't store in one column
+        for c in df.columns[df.dtypes == object]:
+            df[c] = df[c].astype('string')
+        df[CMA_COLUMN] = cma
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def split_supply(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Split a stacked supply frame back into per-CMA frames."""
+    return {str(cma): v.drop(columns=CMA_COLUMN).reset_index(drop=True)
+            for cma, v in df.groupby(CMA_COLUMN, sort=False)}
+
+
+def save_snapshot(supply: dict[str, pd.DataFrame],
+                  cache_dir: Path = SUPPLY_CACHE_DIR) -> Path:
+    """Save freshly scraped supply as a timestamped snapshot."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / (
+        f'scrape-{datetime.now().strftime(TIMESTAMP_FORMAT)}.parquet')
+    stack_supply(supply).to_parquet(path, index=False)
+    return path
+
+
+def snapshot_time(path: Path) -> datetime:
+    """Return when a scraped snapshot was taken, from its file name."""
+    return datetime.strptime(path.stem.removeprefix('scrape-'),
+                             TIMESTAMP_FORMAT)
+
+
+def load_snapshot(max_age: timedelta,
+                  cache_dir: Path = SUPPLY_CACHE_DIR
+                  ) -> dict[str, pd.DataFrame] | None:
+    """Return the newest scraped snapshot if it is younger than max_age."""
+    snapshots = sorted(cache_dir.glob('scrape-*.parquet'))
+    if not snapshots:
+        return None
+    newest = snapshots[-1]
+    if datetime.now() - snapshot_time(newest) > max_age:
+        return None
+    print(f'Using supply snapshot from {snapshot_time(newest)}')
+    return split_supply(pd.read_parquet(newest))
+
+
+def load_supply_file(supply_file: str | Path,
+                     cache_dir: Path = SUPPLY_CACHE_DIR
+                     ) -> dict[str, pd.DataFrame]:
+    """Read a supply workbook, reusing its snapshot if it was read before.
+
+    Snapshots of supply workbooks are keyed by the workbook's content hash
+    so an edited file is always read again.
+    """
+    path = cache_dir / f'file-{file_sha256(supply_file)}.parquet'
+    if path.exists():
+        path.touch()  # Keep recently used snapshots out of eviction
+        return split_supply(pd.read_parquet(path))
+
+    supply = read_sheets(supply_file, None, SUPPLY_COLUMNS)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stack_supply(supply).to_parquet(path, index=False)
+    return supply
+
+
+def evict_snapshots(keep: int,
+                    cache_dir: Path = SUPPLY_CACHE_DIR) -> None:
+    """Delete all but the newest keep snapshots of each kind."""
+    for pattern in ('scrape-*.parquet', 'file-*.parquet'):
+        evict_oldest(cache_dir, pattern, keep)
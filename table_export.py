@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+from pathlib import Path
+
+import pandas as pd
+
+# Machine-readable output: the tables of the Excel report written one file
+# per table, for systems that would otherwise read them back out of the
+# workbook. Nothing here imports xlsxwriter or openpyxl.
+
+# Output formats and their file suffixes. xlsx is the Excel report
+# (report.py); the others write a directory of tables.
+FORMATS: dict[str, str] = {
+    'xlsx': '.xlsx',
+    'parquet': '.parquet',
+    'csv': '.csv',
+    'ndjson': '.ndjson',
+    }
+
+
+def report_tables(hu_df: pd.DataFrame,
+                  shu_df: pd.DataFrame,
+                  shu_summary_df_3y: pd.DataFrame,
+                  shu_summary_df_1y: pd.DataFrame,
+                  hu_summary: pd.DataFrame,
+                  metrics_df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """The report's tables by file name, as write_report() gets them."""
+    return {
+        'hu_data': hu_df,
+        'shu_data': shu_df,
+        'shu_summary_3y': shu_summary_df_3y,
+        'shu_summary_1y': shu_summary_df_1y,
+        'hu_summary': hu_summary,
+        'cma_metrics': metrics_df.rename_axis('cma').reset_index(),
+    }
+
+
+def table_dir(output: str | Path) -> Path:
+    """Directory the tables go to: the output path without .xlsx."""
+    output = Path(output)
+    return output.with_suffix('') if output.suffix == '.xlsx' else output
+
+
+def _date_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Write dates as YYYY-MM-DD, like the CSV tables."""
+    return df.assign(**{c: df[c].dt.strftime('%Y-%m-%d') for c in df.columns
+                        if pd.api.types.is_datetime64_any_dtype(df[c])})
+
+
+def write_table(df: pd.DataFrame, path: Path, output_format: str) -> None:
+    if output_format == 'parquet':
+        df.to_parquet(path, index=False)
+    elif output_format == 'csv':
+        df.to_csv(path, index=False, date_format='%Y-%m-%d')
+    elif output_format == 'ndjson':
+        _date_strings(df).to_json(path, orient='records', lines=True,
+                                  double_precision=15)
+    else:
+        raise ValueError(f'Unknown table format: {output_format}')
+
+
+def write_tables(output: str | Path, output_format: str,
+                 tables: dict[str, pd.DataFrame]) -> Path:
+    """Write each table to <output>/<name>.<format> and return the directory."""
+    directory = table_dir(output)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        write_table(df, directory / f'{name}{FORMATS[output_format]}',
+                    output_format)
+    return directory
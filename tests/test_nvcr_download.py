@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from nvcr_download import _load_index, evict_downloads, fetch_cached
+
+# fetch_cached() against a local HTTP stand-in for the NVCR server. Run
+# from the repository root with: python -m unittest discover tests
+
+WORKBOOK = b'PK\x03\x04 not really a workbook'
+ETAG = '"v1"'
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves WORKBOOK with an ETag, and 304 when the client already has it."""
+
+    requests: list[dict[str, str]] = []
+
+    def do_GET(self) -> None:
+        StandIn.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(WORKBOOK)))
+        self.end_headers()
+        self.wfile.write(WORKBOOK)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FetchCachedTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        StandIn.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.href = f'http://127.0.0.1:{self.server.server_port}/trades.xlsx'
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_304_reuses_cached_workbook(self) -> None:
+        first = fetch_cached(self.href, self.cache_dir)
+        self.assertEqual(first.read_bytes(), WORKBOOK)
+        self.assertNotIn('If-None-Match', StandIn.requests[0])
+
+        second = fetch_cached(self.href, self.cache_dir)
+        self.assertEqual(second, first)
+        self.assertEqual(StandIn.requests[1].get('If-None-Match'), ETAG)
+        self.assertEqual(list(self.cache_dir.glob('*.xlsx')), [first])
+
+    def test_eviction_drops_index_entries(self) -> None:
+        old = fetch_cached(self.href, self.cache_dir)
+        os.utime(old, (0, 0))
+        newer = self.cache_dir / 'newer.xlsx'
+        newer.write_bytes(b'newer')
+
+        evict_downloads(keep=1, cache_dir=self.cache_dir)
+        self.assertFalse(old.exists())
+        self.assertTrue(newer.exists())
+        self.assertEqual(_load_index(self.cache_dir), {})
+
+        # With its entry gone the workbook is fetched in full again
+        path = fetch_cached(self.href, self.cache_dir)
+        self.assertEqual(path.read_bytes(), WORKBOOK)
+        self.assertNotIn('If-None-Match', StandIn.requests[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
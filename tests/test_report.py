@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import report
+from analysis import GHU_REPORT_COLUMNS, SHU_REPORT_COLUMNS, shu_summary_table
+from metrics import GHU_METRICS, cma_aggregates, cma_metrics, hu_overview
+
+# write_report() reopened with openpyxl. The trade sheets are streamed with
+# xlsxwriter internals on the releases in report.STREAMING_XLSXWRITER, so
+# run this before adding a release there. Run from the repository root
+# with: python -m unittest discover tests
+
+GHU_TRADES = 40
+SHU_TRADES = 25
+CMAS = ['Corangamite', 'Melbourne Water', 'Wimmera']
+
+
+def _frames() -> tuple[pd.DataFrame, ...]:
+    dates = pd.date_range('2024-01-01', periods=GHU_TRADES, freq='W')
+    hu_df = pd.DataFrame({
+        'date': dates,
+        'cma': pd.Categorical([CMAS[i % 3] for i in range(GHU_TRADES)]),
+        'sbv': 'Site',
+        'ghu': [0.5 + i / 10 for i in range(GHU_TRADES)],
+        'lt': [i % 4 for i in range(GHU_TRADES)],
+        'ghu_price': [40000.0 + 500 * i for i in range(GHU_TRADES)],
+        'price_in_gst': [22000.0 + 300 * i for i in range(GHU_TRADES)],
+        'price_ex_gst': [20000.0 + 300 * i for i in range(GHU_TRADES)],
+    })[GHU_REPORT_COLUMNS]
+    shu_df = pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=SHU_TRADES, freq='2W'),
+        'lt': 0,
+        'sbu': [1.0 + i for i in range(SHU_TRADES)],
+        'shu_price': [1000.0 + 50 * i for i in range(SHU_TRADES)],
+        'species': [f'Species {i % 5}' for i in range(SHU_TRADES)],
+        'price_in_gst': [1100.0 + 50 * i for i in range(SHU_TRADES)],
+        'price_ex_gst': [1000.0 + 50 * i for i in range(SHU_TRADES)],
+    })[SHU_REPORT_COLUMNS]
+    supply = {cma: pd.DataFrame({'Credit Site ID': ['BBA-1'], 'GHU': [10.0],
+                                 'LT': [3]}) for cma in CMAS}
+    end = datetime(2024, 12, 31)
+    aggregates = cma_aggregates(hu_df)
+    metrics_df = cma_metrics(aggregates, supply)
+    return (hu_df, shu_df, shu_summary_table(shu_df, end, 36),
+            shu_summary_table(shu_df, end, 12),
+            hu_overview(aggregates, metrics_df), metrics_df)
+
+
+class WriteReportTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.frames = _frames()
+
+    def _tables(self, name: str) -> dict[str, list[tuple]]:
+        """Each sheet's tables as (ref, header names, header row count)."""
+        path = self.dir / name
+        report.write_report(str(path), *self.frames)
+        wb = load_workbook(path)
+        tables = {}
+        for ws in wb.worksheets:
+            tables[ws.title] = sorted(
+                (t.ref, [c.name for c in t.tableColumns], t.headerRowCount)
+                for t in ws.tables.values())
+            # Header cells hold the header names
+            for t in ws.tables.values():
+                if t.headerRowCount != 0:
+                    first = ws[t.ref.split(':')[0]]
+                    row = next(ws.iter_rows(
+                        min_row=first.row, max_row=first.row,
+                        min_col=first.column,
+                        max_col=first.column + len(t.tableColumns) - 1,
+                        values_only=True))
+                    self.assertEqual(list(row),
+                                     [c.name for c in t.tableColumns])
+        return tables
+
+    def check_tables(self, tables: dict[str, list[tuple]]) -> None:
+        summary_rows = len(self.frames[2])
+        self.assertEqual(tables['HU Data'], [(
+            f'A1:H{GHU_TRADES + 1}',
+            ['Date', 'CMA', 'SBV', 'GHU', 'LT', 'GHU Price',
+             'Price (in GST)', 'Price (ex GST)'], 1)])
+        shu_tables = tables['SHU Data']
+        self.assertEqual(len(shu_tables), 3)
+        self.assertIn((f'A1:G{SHU_TRADES + 1}',
+                       ['Date', 'LT', 'SHUs', 'SHU Price', 'Species',
+                        'Price (in GST)', 'Price (ex GST)'], 1),
+                      shu_tables)
+        # The summaries beside the trades have no header row
+        for ref in (f'I2:J{summary_rows + 1}',
+                    f'I{summary_rows + 4}:J{2 * summary_rows + 3}'):
+            self.assertIn((ref, ['Column1', 'Column2'], 0), shu_tables)
+        self.assertEqual(tables['HU Summary'][0][0], f'A1:L{len(CMAS) + 1}')
+        for cma in CMAS:
+            self.assertEqual(tables[cma], [(f'A1:B{len(GHU_METRICS) + 1}',
+                                            ['Metric', 'Value'], 1)])
+
+    def test_streamed_tables(self) -> None:
+        if not report.can_stream():
+            self.skipTest('installed xlsxwriter is not streamed with')
+        self.check_tables(self._tables('streamed.xlsx'))
+
+    def test_streamed_matches_normal_mode(self) -> None:
+        with mock.patch.object(report, 'STREAMING_XLSXWRITER', set()):
+            normal = self._tables('normal.xlsx')
+        self.check_tables(normal)
+        self.assertEqual(self._tables('streamed.xlsx'), normal)
+
+    def test_trade_rows(self) -> None:
+        path = self.dir / 'rows.xlsx'
+        report.write_report(str(path), *self.frames)
+        wb = load_workbook(path, read_only=True)
+        hu = list(wb['HU Data'].iter_rows(max_col=8, values_only=True))
+        self.assertEqual(len(hu), GHU_TRADES + 1)
+        self.assertEqual(hu[1][1], 'Corangamite')
+        self.assertEqual(hu[-1][3], self.frames[0]['ghu'].iloc[-1])
+        shu = list(wb['SHU Data'].iter_rows(max_col=7, values_only=True))
+        self.assertEqual(len(shu), SHU_TRADES + 1)
+        wb.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
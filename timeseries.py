@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from metrics import (GHU_METRICS, SHU_METRICS, WA_SITES, derive_ghu_metrics,
+                     supply_metrics, with_no_tree_columns)
+
+# Rolling-window metrics for every month-end in a range. Trades are sorted
+# by date once; each window is a [lo, hi) slice of the sorted rows found
+# with searchsorted, so sums come from cumulative sums and only the order
+# statistics (median, floor, ceiling) look at the rows in a window.
+
+# Columns of the long-format table. SHU metrics are not per CMA and have a
+# missing cma.
+TIMESERIES_COLUMNS: list[str] = ['month_end', 'window_start', 'cma',
+                                 'metric', 'value']
+
+
+def month_ends(start: date | datetime, end: date | datetime) -> pd.DatetimeIndex:
+    """Every month-end from start's month up to and including end."""
+    return pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq='ME')
+
+
+def window_starts(ends: pd.DatetimeIndex, months: int) -> pd.DatetimeIndex:
+    """First day of the n-month window ending at each month-end."""
+    return (ends.to_period('M') - (months - 1)).to_timestamp()
+
+
+def _bounds(dates: np.ndarray, starts: pd.DatetimeIndex,
+            ends: pd.DatetimeIndex) -> tuple[np.ndarray, np.ndarray]:
+    """Row slices [lo, hi) of sorted dates falling in each window."""
+    lo = np.searchsorted(dates, starts.to_numpy(), side='left')
+    hi = np.searchsorted(dates, ends.to_numpy(), side='right')
+    return lo, hi
+
+
+def _window_sums(values: np.ndarray, lo: np.ndarray,
+                 hi: np.ndarray) -> np.ndarray:
+    """Sum of values in each window, skipping NaN like pandas does."""
+    cumulative = np.concatenate(([0.0], np.nancumsum(values, dtype=float)))
+    return cumulative[hi] - cumulative[lo]
+
+
+def _window_stat(values: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                 stat: Callable[[np.ndarray], float]) -> np.ndarray:
+    """Apply stat to the values in each non-empty window, NaN otherwise."""
+    return np.array([stat(values[a:b]) if b > a else np.nan
+                     for a, b in zip(lo, hi)], dtype=float)
+
+
+def _sorted_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(date=pd.to_datetime(df['date'])).sort_values(
+        'date', kind='stable')
+
+
+def ghu_timeseries(ghu_df: pd.DataFrame,
+                   supply: dict[str, pd.DataFrame],
+                   ends: pd.DatetimeIndex,
+                   months: int = 12,
+                   wa: dict[str, list[str]] = WA_SITES) -> pd.DataFrame:
+    """Per-CMA GHU metrics for the n-month window ending at each month-end.
+
+    ghu_df holds the merged GHU trades with canonical CMA names. A CMA only
+    has rows for the windows it traded in, matching cma_metrics(). Supply is
+    a single snapshot, so the supply metrics use today's supply for every
+    window.
+    """
+    starts = window_starts(ends, months)
+    aggregates = {}
+    for cma, trades in _sorted_by_date(with_no_tree_columns(ghu_df)).groupby(
+            'cma', sort=True, observed=True):
+        dates = trades['date'].to_numpy()
+        lo, hi = _bounds(dates, starts, ends)
+        price = trades['ghu_price'].to_numpy(float)
+
+        # No-tree prices are sliced on their own so medians skip the NaNs
+        no_tree = trades[trades['price_nt'].notna()]
+        lo_nt, hi_nt = _bounds(no_tree['date'].to_numpy(), starts, ends)
+
+        g = pd.DataFrame({
+            'ghu': _window_sums(trades['ghu'].to_numpy(float), lo, hi),
+            'value': _window_sums(trades['price_ex_gst'].to_numpy(float), lo, hi),
+            'median': _window_stat(price, lo, hi, np.median),
+            'ghu_nt': _window_sums(trades['ghu_nt'].to_numpy(float), lo, hi),
+            'value_nt': _window_sums(trades['value_nt'].to_numpy(float), lo, hi),
+            'median_nt': _window_stat(no_tree['price_nt'].to_numpy(float),
+                                      lo_nt, hi_nt, np.median),
+            'floor': _window_stat(price, lo, hi, np.min),
+            'lt': _window_sums(trades['lt'].to_numpy(float), lo, hi),
+        }, index=ends.rename('month_end'))
+        aggregates[cma] = g[hi > lo]
+
+    if not aggregates:
+        return pd.DataFrame(columns=TIMESERIES_COLUMNS)
+    g = pd.concat(aggregates, names=['cma']).swaplevel().sort_index()
+
+    s = supply_metrics(supply, wa).reindex(g.index.get_level_values('cma'))
+    for cma in s.index[s['supply'].isna()].unique():
+        print(f"No supply data for {cma}.\n")
+    s.index = g.index
+
+    return _long_format(derive_ghu_metrics(g, s), GHU_METRICS, starts, ends)
+
+
+def shu_timeseries(shu_df: pd.DataFrame, ends: pd.DatetimeIndex,
+                   months: int = 12) -> pd.DataFrame:
+    """SHU summary metrics for the n-month window ending at each month-end.
+
+    The metrics match create_shu_summary() on the trades in each window.
+    """
+    starts = window_starts(ends, months)
+    trades = _sorted_by_date(shu_df)
+    lo, hi = _bounds(trades['date'].to_numpy(), starts, ends)
+    price = trades['shu_price'].to_numpy(float)
+
+    # A trade is a distinct (date, shu_price) pair; both fall in the same
+    # window, so counting first occurrences is additive
+    first = ~trades.duplicated(['date', 'shu_price']).to_numpy()
+    total_sbu = _window_sums(trades['sbu'].to_numpy(float), lo, hi)
+    total_value = _window_sums(trades['price_ex_gst'].to_numpy(float), lo, hi)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average = np.where(total_sbu > 0, total_value / total_sbu, np.nan)
+
+    summary = pd.DataFrame({
+        'Number of SHU trades': _window_sums(first, lo, hi),
+        'Total SHUs traded': total_sbu,
+        'Total Value of SHU trades': total_value,
+        'Average Price per SHU': average,
+        'SHU Floor Price': _window_stat(price, lo, hi, np.min),
+        'SHU Ceiling Price': _window_stat(price, lo, hi, np.max),
+        'SHU median price': _window_stat(
+            price, lo, hi, lambda x: np.median(np.unique(x))),
+    }, index=ends.rename('month_end'))
+    summary['cma'] = pd.NA
+    summary = summary.set_index('cma', append=True)
+
+    return _long_format(summary, SHU_METRICS, starts, ends)
+
+
+def _long_format(wide: pd.DataFrame, metrics: list[str],
+                 starts: pd.DatetimeIndex,
+                 ends: pd.DatetimeIndex) -> pd.DataFrame:
+    """Melt a (month_end, cma) x metric table into TIMESERIES_COLUMNS."""
+    long = wide[metrics].reset_index().melt(
+        id_vars=['month_end', 'cma'], var_name='metric', value_name='value')
+    long['metric'] = pd.Categorical(long['metric'], categories=metrics)
+    long['window_start'] = long['month_end'].map(dict(zip(ends, starts)))
+    long = long.sort_values(['month_end', 'cma', 'metric'], kind='stable',
+                            na_position='first')
+    long['metric'] = long['metric'].astype(str)
+    return long[TIMESERIES_COLUMNS].reset_index(drop=True)
+
+
+def rolling_metrics(ghu_df: pd.DataFrame, shu_df: pd.DataFrame,
+                    supply: dict[str, pd.DataFrame],
+                    start: date | datetime, end: date | datetime,
+                    months: int = 12) -> pd.DataFrame:
+    """GHU and SHU metrics for every month-end from start to end.
+
+    Each month-end gets the n-month window ending on it. Returns one long
+    table with the SHU metrics first in each month.
+    """
+    ends = month_ends(start, end)
+    series = pd.concat([shu_timeseries(shu_df, ends, months),
+                        ghu_timeseries(ghu_df, supply, ends, months)],
+                       ignore_index=True)
+    series['cma'] = series['cma'].astype('string')
+    return series.sort_values('month_end', kind='stable').reset_index(drop=True)
+
+
+def write_timeseries(series: pd.DataFrame, output_file: str | Path) -> None:
+    """Write the long-format table as Parquet or, by default, CSV."""
+    if Path(output_file).suffix == '.parquet':
+        series.to_parquet(output_file, index=False)
+    else:
+        series.to_csv(output_file, index=False, date_format='%Y-%m-%d')
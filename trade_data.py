@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from cache import CACHE_DIR, evict_oldest, file_sha256
+from excel_reader import read_sheet
+from species import combine_species, species_columns
+
+HU_SHEET = 'Trade Prices by HU'
+
+# Usable names for the first 12 columns of the HU sheet
+HU_COLUMNS: list[str] = [
+    'date', 'cma', 'sbv', 'ghu', 'lt', 'sbu', 'ghu_price', 'shu_price',
+    'species', 'price_in_gst', 'price_ex_gst', 'unnamed'
+    ]
+
+# Normalized HU frames are stored as uncompressed Arrow IPC files named by
+# the workbook's content hash so they can be memory-mapped on later runs
+PARSED_CACHE_DIR: Path = CACHE_DIR / 'parsed'
+
+# Bump when normalize_hu_frame changes so stale frames aren't reused
+PARSED_VERSION = 2
+
+
+def normalize_hu_frame(hu_df: pd.DataFrame) -> pd.DataFrame:
+    """Turn the raw 'Trade Prices by HU' sheet into the analysis frame."""
+    # Keep only the first 12 columns (the rest are empty unnamed columns)
+    hu_df = hu_df.iloc[:, :12]
+
+    # Rename the columns to something usable
+    hu_df = hu_df.set_axis(HU_COLUMNS, axis=1)
+
+    # CMA names and species strings repeat across thousands of trades, so
+    # they are held as categoricals of strings (species keeps its NaNs)
+    hu_df['cma'] = hu_df['cma'].map(str).astype('category')
+    hu_df['species'] = hu_df['species'].where(
+        hu_df['species'].isna(), hu_df['species'].astype(str)
+        ).astype('category')
+
+    # Keep dates as datetime64, dropping any time of day. They only become
+    # Python dates when the report is written.
+    hu_df['date'] = pd.to_datetime(hu_df['date']).dt.normalize()
+
+    # Drop the last column because it's not needed
+    hu_df = hu_df.drop(['unnamed'], axis=1)
+
+    # Convert numeric columns to proper types (handle string data from Excel)
+    for x in ['ghu', 'ghu_price', 'sbu', 'shu_price', 'price_ex_gst']:
+        hu_df[x] = pd.to_numeric(hu_df[x], errors='coerce').fillna(0)
+    # These keep their missing values; later steps treat them as 0
+    for x in ['sbv', 'lt', 'price_in_gst']:
+        hu_df[x] = pd.to_numeric(hu_df[x], errors='coerce')
+
+    return hu_df
+
+
+def read_hu_sheet(workbook: str | Path) -> pd.DataFrame:
+    """Read the first 12 columns of the raw 'Trade Prices by HU' sheet."""
+    return read_sheet(workbook, HU_SHEET, len(HU_COLUMNS))
+
+
+def load_hu_frame(workbook: str | Path,
+                  cache_dir: Path | None = PARSED_CACHE_DIR,
+                  keep: int = 5) -> pd.DataFrame:
+    """Return the normalized HU frame for an NVCR trade workbook.
+
+    The first run on a workbook parses the Excel file and stores the result
+    keyed by content hash. Later runs on the same file memory-map that
+    instead of parsing Excel again. Pass cache_dir=None to always parse.
+    """
+    if cache_dir is None:
+        return normalize_hu_frame(read_hu_sheet(workbook))
+
+    path = cache_dir / f'{file_sha256(workbook)}-v{PARSED_VERSION}.arrow'
+    if path.exists():
+        path.touch()  # Keep recently used frames out of eviction
+        return feather.read_feather(path, memory_map=True)
+
+    hu_df = normalize_hu_frame(read_hu_sheet(workbook))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    hu_df.reset_index(drop=True).to_feather(path, compression='uncompressed')
+    evict_oldest(cache_dir, '*.arrow', keep)
+    return hu_df
+
+
+def merge_duplicate_ghu_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge duplicate GHU trades where date, cma, and ghu_price are identical.
+    Sum quantities (ghu, lt) and prices (price_in_gst, price_ex_gst).
+    Keep the highest sbv value from each group.
+    """
+    if df.empty:
+        return df
+
+    merged: pd.DataFrame = df.groupby(['date', 'cma', 'ghu_price'], as_index=False,
+                                      observed=True).agg({
+        'sbv': 'max',
+        'ghu': 'sum',
+        'lt': 'sum',
+        'price_in_gst': 'sum',
+        'price_ex_gst': 'sum'
+    })
+    return merged
+
+
+def merge_duplicate_shu_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge duplicate SHU trades where date, shu_price, and base species are identical.
+    Sum quantities (sbu, lt) and prices (price_in_gst, price_ex_gst).
+    Combine all unique species names in output.
+    """
+    if df.empty:
+        return df
+
+    # Parse each distinct species string once into categorical columns
+    df = pd.concat([df, species_columns(df['species'])], axis=1)
+
+    # Group by date, shu_price, and base_species codes
+    grouped = df.groupby(['date', 'shu_price', 'base_species'], observed=True)
+    merged: pd.DataFrame = grouped.agg({
+        'sbu': 'sum',
+        'lt': 'sum',
+        'price_in_gst': 'sum',
+        'price_ex_gst': 'sum'
+    }).reset_index()
+
+    # Combine the species names seen in each group. Only distinct
+    # (group, alternates) pairs are visited, not every row.
+    pairs = pd.DataFrame({'group': grouped.ngroup(),
+                          'alt': df['alt_species'].astype(str)}
+                         ).drop_duplicates()
+    alt_sets: dict[int, set[str]] = {}
+    for group, alt in pairs.itertuples(index=False):
+        alt_sets.setdefault(group, set()).update(alt.split(', '))
+    merged['species'] = pd.Categorical([
+        combine_species(str(base), tuple(alt_sets[i]))
+        for i, base in enumerate(merged['base_species'])])
+
+    # Reorder columns to match original order
+    merged = merged[['date', 'sbu', 'lt', 'species', 'shu_price', 'price_in_gst', 'price_ex_gst']]
+
+    return merged
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analysis import (default_window, merge_trades, parse_date, period_start,
+                      prepare_trades)
+from metrics import (cma_aggregates, create_shu_summary, derive_ghu_metrics,
+                     hu_overview, supply_metrics)
+from supply_cache import SUPPLY_CACHE_DIR, load_supply_file, split_supply
+from trade_data import load_hu_frame
+from trade_store import store_dir
+
+# A long-running analysis service. The trade and supply data are loaded and
+# normalized once and kept in memory, sorted by date, so a query for any
+# window is a searchsorted slice plus one grouped aggregation. Queries are
+# answered as JSON over local HTTP:
+#
+#   GET  /cma-metrics?start=YYYY-MM-DD&end=YYYY-MM-DD  per-CMA GHU metrics
+#   GET  /hu-summary?start=...&end=...                 the HU Summary table
+#   GET  /shu-summary?end=...&months=12                SHU summary of the n
+#                                                      months ending in end's
+#                                                      month (or start=...)
+#   GET  /status                                       what is loaded
+#   POST /reload                                       reload now
+#
+# start and end default to the report's default window. The inputs are
+# polled, and the data is reloaded when a new NVCR file or supply snapshot
+# arrives. Queries keep using the old data until the new data is ready.
+
+DEFAULT_PORT = 8765
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+
+class Sources(NamedTuple):
+    """Where the service loads from.
+
+    trades is an NVCR workbook or a directory whose newest .xlsx is used.
+    supply is a supply workbook, or None for the newest scraped snapshot.
+    """
+    trades: Path
+    supply: Path | None
+
+
+def _newest(paths: list[Path], what: str) -> Path:
+    if not paths:
+        raise FileNotFoundError(f'No {what} found')
+    return max(paths, key=lambda p: (p.stat().st_mtime_ns, p.name))
+
+
+def resolve(sources: Sources) -> tuple[Path, Path]:
+    """The trade workbook and supply file the sources point at right now."""
+    trades = sources.trades
+    if trades.is_dir():
+        trades = _newest(list(trades.glob('*.xlsx')),
+                         f'NVCR workbook in {trades}')
+    supply = sources.supply or _newest(
+        list(SUPPLY_CACHE_DIR.glob('scrape-*.parquet')),
+        f'supply snapshot in {SUPPLY_CACHE_DIR}; pass --supply')
+    return trades, supply
+
+
+def signature(files: tuple[Path, Path]) -> tuple[tuple[str, int, int], ...]:
+    """Changes when either file is replaced or rewritten."""
+    return tuple((str(f), f.stat().st_mtime_ns, f.stat().st_size)
+                 for f in files)
+
+
+class TradeData:
+    """Prepared trade and supply data with date indexes for fast windows."""
+
+    def __init__(self, ghu_df: pd.DataFrame, shu_df: pd.DataFrame,
+                 supply: dict[str, pd.DataFrame],
+                 files: tuple[Path, Path]) -> None:
+        # Sorted oldest first so a window is one contiguous slice
+        self.ghu = ghu_df.sort_values('date', kind='stable').reset_index(drop=True)
+        self.shu = shu_df.sort_values('date', kind='stable').reset_index(drop=True)
+        self.ghu_dates = self.ghu['date'].to_numpy()
+        self.shu_dates = self.shu['date'].to_numpy()
+        # Supply doesn't depend on the window
+        self.supply = supply_metrics(supply)
+        self.files = files
+        self.signature = signature(files)
+        self.loaded_at = datetime.now()
+
+    @staticmethod
+    def _window(df: pd.DataFrame, dates: np.ndarray, start: datetime,
+                end: datetime) -> pd.DataFrame:
+        lo = np.searchsorted(dates, np.datetime64(start.date()), side='left')
+        hi = np.searchsorted(dates, np.datetime64(end.date()), side='right')
+        return df.iloc[lo:hi]
+
+    def ghu_window(self, start: datetime, end: datetime) -> pd.DataFrame:
+        return self._window(self.ghu, self.ghu_dates, start, end)
+
+    def shu_window(self, start: datetime, end: datetime) -> pd.DataFrame:
+        return self._window(self.shu, self.shu_dates, start, end)
+
+    def cma_metrics(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """The per-CMA GHU metrics of a report for start to end."""
+        g = cma_aggregates(self.ghu_window(start, end))
+        return derive_ghu_metrics(g, self.supply.reindex(g.index))
+
+    def hu_summary(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """The HU Summary table of a report for start to end."""
+        g = cma_aggregates(self.ghu_window(start, end))
+        return hu_overview(g, derive_ghu_metrics(g, self.supply.reindex(g.index)))
+
+    def shu_summary(self, start: datetime, end: datetime) -> dict[str, Any]:
+        return create_shu_summary(self.shu_window(start, end))
+
+
+def load_data(sources: Sources, use_store: bool = True) -> TradeData:
+    """Load, merge and normalize the trade and supply data the sources name."""
+    trade_file, supply_file = resolve(sources)
+    logging.info(f'Loading trades from {trade_file} and supply from '
+                 f'{supply_file}')
+    start = time.perf_counter()
+    if sources.supply:
+        supply = load_supply_file(supply_file)
+    else:
+        supply = split_supply(pd.read_parquet(supply_file))
+    # One store per --input, so switching workbooks keeps each one's months
+    store = store_dir(str(sources.trades.resolve())) if use_store else None
+    ghu_df, shu_df = prepare_trades(*merge_trades(load_hu_frame(trade_file),
+                                                  store))
+    data = TradeData(ghu_df, shu_df, supply, (trade_file, supply_file))
+    logging.info(f'Loaded {len(data.ghu)} GHU and {len(data.shu)} SHU trades '
+                 f'in {time.perf_counter() - start:.1f} s')
+    return data
+
+
+def _window_params(params: dict[str, str],
+                   months: int | None = None) -> tuple[datetime, datetime]:
+    """start and end from the query.
+
+    They default to the report's window, or with months to the n months
+    ending in end's month.
+    """
+    start, end = default_window()
+    if 'end' in params:
+        end = parse_date(params['end'])
+    if 'start' in params:
+        start = parse_date(params['start'])
+    elif months is not None:
+        start = period_start(end, months)
+    if start > end:
+        raise ValueError('start is after end')
+    return start, end
+
+
+def _json(df: pd.DataFrame | pd.Series, orient: str) -> Any:
+    """A frame as JSON values, with NaN and infinity as null."""
+    return json.loads(df.to_json(orient=orient, double_precision=15,
+                                 date_format='iso'))
+
+
+def query_cma_metrics(data: TradeData, params: dict[str, str]) -> dict[str, Any]:
+    start, end = _window_params(params)
+    return {'start': str(start.date()), 'end': str(end.date()),
+            'cmas': _json(data.cma_metrics(start, end), 'index')}
+
+
+def query_hu_summary(data: TradeData, params: dict[str, str]) -> dict[str, Any]:
+    start, end = _window_params(params)
+    return {'start': str(start.date()), 'end': str(end.date()),
+            'rows': _json(data.hu_summary(start, end), 'records')}
+
+
+def query_shu_summary(data: TradeData, params: dict[str, str]) -> dict[str, Any]:
+    """The SHU summary of the n months ending in end's month, or start to end."""
+    start, end = _window_params(params, int(params.get('months', 12)))
+    summary = pd.Series(data.shu_summary(start, end), dtype=float)
+    return {'start': str(start.date()), 'end': str(end.date()),
+            'summary': _json(summary, 'index')}
+
+
+def query_status(data: TradeData, params: dict[str, str]) -> dict[str, Any]:
+    trade_file, supply_file = data.files
+    return {'trade_file': str(trade_file), 'supply_file': str(supply_file),
+            'loaded_at': data.loaded_at.isoformat(timespec='seconds'),
+            'ghu_trades': len(data.ghu), 'shu_trades': len(data.shu)}
+
+
+ROUTES: dict[str, Callable[[TradeData, dict[str, str]], dict[str, Any]]] = {
+    '/cma-metrics': query_cma_metrics,
+    '/hu-summary': query_hu_summary,
+    '/shu-summary': query_shu_summary,
+    '/status': query_status,
+}
+
+
+class TradeServer(ThreadingHTTPServer):
+    """HTTP server holding the loaded data and reloading it when it changes."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], sources: Sources,
+                 use_store: bool = True) -> None:
+        self.sources = sources
+        self.use_store = use_store
+        self.data = load_data(sources, use_store)
+        self._reload_lock = threading.Lock()
+        super().__init__(address, QueryHandler)
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload if the input files changed (or always with force).
+
+        The new data replaces the old in one assignment, so queries in
+        flight finish on the data they started with.
+        """
+        with self._reload_lock:
+            current = signature(resolve(self.sources))
+            if not force and current == self.data.signature:
+                return False
+            self.data = load_data(self.sources, self.use_store)
+            return True
+
+    def watch(self, interval: float) -> None:
+        """Poll the inputs every interval seconds, reloading on a change."""
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception:
+                logging.exception('Reload failed; still serving the old data')
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server: TradeServer
+
+    def _send(self, status: int, body: dict[str, Any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send(404, {'error': f'Unknown path {url.path}',
+                             'paths': sorted(ROUTES)})
+            return
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            self._send(200, route(self.server.data, params))
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            logging.exception(f'Query {self.path} failed')
+            self._send(500, {'error': f'Query failed: {e}'})
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != '/reload':
+            self._send(404, {'error': f'Unknown path {self.path}'})
+            return
+        try:
+            self.server.reload(force=True)
+        except Exception as e:
+            logging.exception('Reload failed; still serving the old data')
+            self._send(500, {'error': f'Reload failed: {e}'})
+            return
+        self._send(200, query_status(self.server.data, {}))
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f'{self.address_string()} {format % args}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve per-CMA metrics and '
+                                     'SHU summaries for any date window as '
+                                     'JSON over local HTTP.')
+    parser.add_argument("-i", "--input", type=Path, required=True,
+                        help='NVCR trade workbook, or a directory whose '
+                             'newest .xlsx file is used')
+    parser.add_argument("-s", "--supply", type=Path,
+                        help='Supply workbook. Default is the newest '
+                             'scraped supply snapshot')
+    parser.add_argument("--host", default='127.0.0.1',
+                        help='Address to listen on. Default is 127.0.0.1')
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on. Default is {DEFAULT_PORT}')
+    parser.add_argument("--poll", type=float, default=60,
+                        help='Seconds between checks for a new NVCR file or '
+                             'supply snapshot. Default is 60')
+    parser.add_argument("--no-store", action='store_true',
+                        help='Merge the full trade history instead of '
+                             'updating the incremental trade store')
+    args = parser.parse_args()
+
+    server = TradeServer((args.host, args.port),
+                         Sources(args.input, args.supply),
+                         use_store=not args.no_store)
+    threading.Thread(target=server.watch, args=(args.poll,),
+                     daemon=True).start()
+    logging.info(f'Serving on http://{args.host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from cache import CACHE_DIR
+from trade_data import merge_duplicate_ghu_trades, merge_duplicate_shu_trades
+
+# Store of merged GHU and SHU trades, partitioned by trade month. Each month
+# keeps a digest of the normalized rows it was merged from, so a new
+# download only re-merges the months whose rows changed, and an unchanged
+# one costs a digest and a memory-mapped read.
+#
+# Every input has its own store (see store_dir), so a run on one workbook
+# doesn't drop the months another workbook holds. A store is a directory of
+# ghu.arrow and shu.arrow, uncompressed Arrow IPC files of the merged trades
+# ordered by month, and state.json with the month digests.
+STORE_ROOT: Path = CACHE_DIR / 'trades'
+
+# Store key of the NVCR download, which every download run shares
+DOWNLOAD_KEY = 'nvcr-download'
+
+# Bump when the normalization or merge logic changes; a store written by
+# another version is rebuilt from scratch
+STORE_VERSION = 3
+
+GHU_COLUMNS: list[str] = ['date', 'cma', 'ghu_price', 'sbv', 'ghu', 'lt',
+                          'price_in_gst', 'price_ex_gst']
+SHU_COLUMNS: list[str] = ['date', 'sbu', 'lt', 'species', 'shu_price',
+                          'price_in_gst', 'price_ex_gst']
+
+# Text columns, held as categoricals like the normalized frame
+CATEGORY_COLUMNS: list[str] = ['cma', 'species']
+
+
+def store_dir(key: str, root: Path = STORE_ROOT) -> Path:
+    """The store for one input: DOWNLOAD_KEY or a workbook's resolved path."""
+    return root / hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _month_numbers(dates: pd.Series) -> np.ndarray:
+    """Each date's month as a count of months since 1970-01."""
+    return dates.to_numpy().astype('datetime64[M]').astype('int64')
+
+
+def _months(dates: pd.Series) -> np.ndarray:
+    """Each date's month as YYYY-MM."""
+    return _month_numbers(dates).astype('datetime64[M]').astype(str)
+
+
+def month_digests(hu_df: pd.DataFrame) -> dict[str, str]:
+    """Digest of each month's normalized trades, independent of row order."""
+    months = _month_numbers(hu_df['date'])
+    row_hashes = pd.util.hash_pandas_object(hu_df, index=False).to_numpy()
+    # Sorted by month, then by row hash so row order doesn't matter
+    order = np.lexsort((row_hashes, months))
+    months, row_hashes = months[order], row_hashes[order]
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    ends = np.r_[starts[1:], len(months)]
+    names = months[starts].astype('datetime64[M]').astype(str)
+    return {str(name): hashlib.sha256(row_hashes[a:b].tobytes()).hexdigest()
+            for name, a, b in zip(names, starts, ends)}
+
+
+def _read_state(directory: Path) -> dict[str, Any]:
+    """The store's state, or an empty one if it is missing or stale."""
+    try:
+        with open(directory / 'state.json') as f:
+            state: dict[str, Any] = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    files_exist = all((directory / f'{kind}.arrow').exists()
+                      for kind in ('ghu', 'shu'))
+    if state.get('version') != STORE_VERSION or not files_exist:
+        return {}
+    return state
+
+
+def _write(df: pd.DataFrame, path: Path) -> None:
+    """Replace path in one step, so a reader never sees half a file."""
+    tmp = path.with_suffix('.tmp')
+    df.reset_index(drop=True).to_feather(tmp, compression='uncompressed')
+    os.replace(tmp, path)
+
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype(object).astype('category')
+    return df
+
+
+def _replace_months(stored: pd.DataFrame, merged: pd.DataFrame,
+                    stale: list[str]) -> pd.DataFrame:
+    """Swap the stale months of stored for merged, keeping months in order.
+
+    Within a month the rows stay in merge order.
+    """
+    kept = stored[~np.isin(_months(stored['date']), stale)]
+    df = pd.concat([kept, merged], ignore_index=True)
+    order = np.argsort(_month_numbers(df['date']), kind='stable')
+    return _categorize(df.iloc[order].reset_index(drop=True))
+
+
+def update_store(hu_df: pd.DataFrame, directory: Path) -> list[str]:
+    """Bring the store in line with a freshly normalized HU frame.
+
+    Months whose rows are new or changed are merged again and replace their
+    stored trades; months no longer present are removed. Returns the
+    months that changed.
+    """
+    digests = month_digests(hu_df)
+    state = _read_state(directory)
+    stored = state.get('months', {})
+    changed = sorted(m for m, d in digests.items() if stored.get(m) != d)
+    removed = sorted(set(stored) - set(digests))
+    if not state or changed or removed:
+        # Duplicates share a date, so merging just the changed months
+        # gives the same rows as merging the whole history
+        delta = hu_df[np.isin(_months(hu_df['date']), changed)]
+        ghu = merge_duplicate_ghu_trades(delta[pd.isnull(delta['species'])])
+        shu = merge_duplicate_shu_trades(delta[pd.notnull(delta['species'])])
+        ghu, shu = ghu[GHU_COLUMNS], shu[SHU_COLUMNS]
+        if state:
+            stored_ghu, stored_shu = load_trades(directory)
+            ghu = _replace_months(stored_ghu, ghu, changed + removed)
+            shu = _replace_months(stored_shu, shu, changed + removed)
+
+        directory.mkdir(parents=True, exist_ok=True)
+        _write(ghu, directory / 'ghu.arrow')
+        _write(shu, directory / 'shu.arrow')
+        tmp = directory / 'state.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': STORE_VERSION, 'months': digests}, f,
+                      indent=2, sort_keys=True)
+        os.replace(tmp, directory / 'state.json')
+
+    return changed
+
+
+def load_trades(directory: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the stored merged GHU and SHU trades in merge order."""
+    return (_categorize(feather.read_feather(directory / 'ghu.arrow',
+                                             memory_map=True)),
+            _categorize(feather.read_feather(directory / 'shu.arrow',
+                                             memory_map=True)))